@@ -3,55 +3,114 @@ import warnings
 import sys
 import io
 import os
+import hashlib
+import re
+import builtins
+import contextlib
+import tempfile
+import threading
 from pathlib import Path
 from queue import Queue
-from kokoro import KPipeline
+from concurrent.futures import ThreadPoolExecutor
 import soundfile as sf
 
 logger = logging.getLogger(__name__)
 
-class AudioGenerator:
-    def __init__(self):
-        self._initialized = False
-        self._init()
+MAX_CHUNK_CHARS = 4000
+AUDIO_CACHE_MAX_BYTES = 200 * 1024 * 1024  # Per-user cap on cached audio files
+
+_GLOBAL_INIT_DONE = False
+
+def _global_init():
+    """Process-wide warning/encoding setup, done once no matter how many generators exist"""
+    global _GLOBAL_INIT_DONE
+    if _GLOBAL_INIT_DONE:
+        return
         
+    # Configure warnings and encoding
+    warnings.filterwarnings("ignore", category=UserWarning, module="torch.nn.modules.rnn")
+    warnings.filterwarnings("ignore", category=FutureWarning, module="torch.nn.utils.weight_norm")
+
+    # Force UTF-8 encoding
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+    
+    # Set environment variables
+    os.environ['PYTHONUTF8'] = '1'
+    os.environ['PYTHONIOENCODING'] = 'utf-8'
+    _GLOBAL_INIT_DONE = True
+
+@contextlib.contextmanager
+def _force_utf8_json_open():
+    """Temporarily patch builtins.open to read .json files as utf-8 (Kokoro's configs)"""
+    original_open = builtins.open
+    def open_utf8(*args, **kwargs):
+        if 'encoding' not in kwargs and args and isinstance(args[0], str) and args[0].endswith('.json'):
+            kwargs['encoding'] = 'utf-8'
+        return original_open(*args, **kwargs)
+    builtins.open = open_utf8
+    try:
+        yield
+    finally:
+        builtins.open = original_open
+
+# Break after sentence-ending punctuation or at line breaks; unlike splitting on
+# '. ' this keeps '!'/'?' endings and doesn't need the punctuation re-added
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+|\n+')
+
+def split_into_chunks(text, max_chars=MAX_CHUNK_CHARS):
+    """Group sentences into chunks of at most max_chars (single long sentences stay whole)"""
+    sentences = [s for s in (part.strip() for part in SENTENCE_SPLIT.split(text)) if s]
+    chunks = []
+    current_chunk = []
+    current_length = 0
+    for sentence in sentences:
+        # current_length counts the joining spaces too
+        if current_chunk and current_length + len(sentence) > max_chars:
+            chunks.append(' '.join(current_chunk))
+            current_chunk = []
+            current_length = 0
+        current_chunk.append(sentence)
+        current_length += len(sentence) + 1
+    if current_chunk:
+        chunks.append(' '.join(current_chunk))
+    return chunks
+
+class AudioGenerator:
+    """Process-wide singleton; the Kokoro pipeline is loaded on first use and shared"""
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __new__(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                instance = super().__new__(cls)
+                instance._initialized = False
+                instance._init_lock = threading.Lock()
+                cls._instance = instance
+            return cls._instance
+
     def _init(self):
-        if self._initialized:
-            return
-            
-        try:
-            # Configure warnings and encoding
-            warnings.filterwarnings("ignore", category=UserWarning, module="torch.nn.modules.rnn")
-            warnings.filterwarnings("ignore", category=FutureWarning, module="torch.nn.utils.weight_norm")
+        with self._init_lock:
+            if self._initialized:
+                return
+            self._load_pipeline()
 
-            # Force UTF-8 encoding
-            sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
-            sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
-            
-            # Set environment variables
-            os.environ['PYTHONUTF8'] = '1'
-            os.environ['PYTHONIOENCODING'] = 'utf-8'
-
-            # Monkey-patch builtins.open to force utf-8 encoding for .json files
-            import builtins
-            original_open = builtins.open
-            def open_utf8(*args, **kwargs):
-                if 'encoding' not in kwargs and args and isinstance(args[0], str) and args[0].endswith('.json'):
-                    kwargs['encoding'] = 'utf-8'
-                return original_open(*args, **kwargs)
-            builtins.open = open_utf8
+    def _load_pipeline(self):
+        try:
+            _global_init()
 
             # Initialize directories
             self.audio_dir = os.path.join(str(Path.home()), '.personalblobai', 'audio')
             os.makedirs(self.audio_dir, exist_ok=True)
             
-            # Initialize pipeline with only supported parameters
+            # Initialize pipeline with only supported parameters; kokoro pulls in torch,
+            # so it is only imported once audio is actually requested
             logger.info("Initializing Kokoro TTS Pipeline...")
-            self.pipeline = KPipeline(lang_code='a')  # Removed encoding parameter
+            from kokoro import KPipeline
+            with _force_utf8_json_open():
+                self.pipeline = KPipeline(lang_code='a')  # Removed encoding parameter
             self.audio_queue = Queue()
-
-            # Restore the original open function to avoid side effects
-            builtins.open = original_open
             
             self._initialized = True
             logger.info("Kokoro TTS Pipeline initialized successfully")
@@ -70,56 +129,94 @@ class AudioGenerator:
             user_audio_dir = os.path.join(self.audio_dir, str(user_id))
             os.makedirs(user_audio_dir, exist_ok=True)
             
-            # Clean text and split into much larger chunks (2000 chars)
+            # Clean text and split into much larger chunks (up to MAX_CHUNK_CHARS)
             text = text.encode('utf-8', errors='ignore').decode('utf-8')
             
             # Split on sentences to avoid cutting words
-            sentences = text.replace('\n', '. ').split('. ')
-            chunks = []
-            current_chunk = []
-            current_length = 0
-            
-            for sentence in sentences:
-                sentence = sentence.strip()
-                if not sentence:
-                    continue
-                    
-                # If adding this sentence would exceed chunk size, save current chunk
-                if current_length + len(sentence) > 4000 and current_chunk:
-                    chunks.append('. '.join(current_chunk) + '.')
-                    current_chunk = []
-                    current_length = 0
-                
-                current_chunk.append(sentence)
-                current_length += len(sentence) + 2  # +2 for '. '
-            
-            # Add remaining sentences
-            if current_chunk:
-                chunks.append('. '.join(current_chunk) + '.')
+            chunks = split_into_chunks(text)
             
             logger.info(f"Split text into {len(chunks)} chunks for audio generation")
             
+            # Synthesize chunks concurrently; torch releases the GIL during inference
+            tasks = [(i, chunk, user_audio_dir) for i, chunk in enumerate(chunks)]
             audio_files = []
-            for i, chunk in enumerate(chunks):
-                try:
-                    generator = self.pipeline(
-                        chunk,
-                        voice='af_sky',
-                        speed=1
-                    )
-                    
-                    for _, _, audio in generator:
-                        if audio is not None:
-                            file_path = os.path.join(user_audio_dir, f'audio_{i}.wav')
-                            sf.write(file_path, audio, 24000)
-                            audio_files.append(file_path)
-                            break
-                except Exception as chunk_error:
-                    logger.error(f"Error processing chunk {i}: {chunk_error}")
-                    continue
+            if tasks:
+                with ThreadPoolExecutor(max_workers=min(4, len(tasks))) as executor:
+                    audio_files = [path for path in executor.map(self._synthesize_chunk, tasks) if path]
+                self._evict_audio(user_audio_dir, keep=set(audio_files))
             
             return audio_files if audio_files else None
             
         except Exception as e:
             logger.error(f"Error generating audio: {e}")
             return None
+
+    def _synthesize_chunk(self, task):
+        """Synthesize one text chunk to a wav file and return its path, or None on failure"""
+        i, chunk, user_audio_dir = task
+        
+        # Files are keyed by a hash of voice + text, so unchanged chunks are reused
+        chunk_hash = hashlib.blake2b(f"af_sky:{chunk}".encode('utf-8'), digest_size=12).hexdigest()
+        file_path = os.path.join(user_audio_dir, f'audio_{chunk_hash}.wav')
+        if os.path.exists(file_path):
+            logger.debug(f"Reusing cached audio for chunk {i}")
+            try:
+                os.utime(file_path)  # Mark as recently used for _evict_audio
+                return file_path
+            except OSError:
+                pass  # Evicted meanwhile; synthesize it again
+
+        tmp_path = None
+        try:
+            generator = self.pipeline(
+                chunk,
+                voice='af_sky',
+                speed=1
+            )
+            
+            # Stream each segment to disk as it is produced; write to a unique temp file
+            # so a failed chunk never leaves a partial file behind for the cache, and
+            # duplicate chunks or concurrent requests don't write over each other
+            fd, tmp_path = tempfile.mkstemp(dir=user_audio_dir, prefix=f'audio_{chunk_hash}.', suffix='.part')
+            os.close(fd)
+            frames = 0
+            with sf.SoundFile(tmp_path, mode='w', samplerate=24000, channels=1,
+                              subtype='PCM_16', format='WAV') as snd:
+                for _, _, audio in generator:
+                    if audio is not None:
+                        snd.write(audio)
+                        frames += len(audio)
+            
+            if frames:
+                os.replace(tmp_path, file_path)
+                return file_path
+        except Exception as chunk_error:
+            logger.error(f"Error processing chunk {i}: {chunk_error}")
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return None
+
+    def _evict_audio(self, user_audio_dir, keep=()):
+        """Delete the least recently used audio files once the directory exceeds AUDIO_CACHE_MAX_BYTES"""
+        try:
+            entries = []
+            with os.scandir(user_audio_dir) as it:
+                for entry in it:
+                    if entry.name.endswith('.wav') and entry.is_file():
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            for _, size, path in sorted(entries):
+                if total <= AUDIO_CACHE_MAX_BYTES:
+                    break
+                if path in keep:
+                    continue
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(path)
+                total -= size
+                removed += 1
+            if removed:
+                logger.info(f"Evicted {removed} cached audio files from {user_audio_dir}")
+        except OSError as e:
+            logger.error(f"Error evicting cached audio: {e}")
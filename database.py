@@ -1,14 +1,71 @@
 import sqlite3
-from datetime import datetime
 import os
 from pathlib import Path
 import logging
 import numpy as np
-from numpy.linalg import norm
+import re
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from embedding_index import EmbeddingIndex
+
+try:
+    import sqlite_vec
+except ImportError:  # Optional: fall back to NumPy similarity search
+    sqlite_vec = None
 
 logger = logging.getLogger(__name__)
 
+# Rows handed to the bot; built with _make so call sites use names instead of positions
+Blob = namedtuple('Blob', 'id user_id content_type content file_path is_public timestamp ai_summary username')
+SearchResult = namedtuple('SearchResult', 'id content content_type summary similarity')
+
+def _quantize_embedding(embedding):
+    """Quantize an embedding to int8, returning (bytes, per-vector scale, norm of the quantized vector)"""
+    embedding = np.asarray(embedding, dtype=np.float32)
+    scale = float(np.max(np.abs(embedding))) / 127 or 1.0
+    codes = np.round(embedding / scale).astype(np.int8)
+    values = codes.astype(np.float32)
+    # sqrt(dot) skips np.linalg.norm's argument dispatch, which dominates for one small vector
+    return codes.tobytes(), scale, float(np.sqrt(values @ values)) * scale
+
+def _decode_embedding(data, scale):
+    """Decode a stored embedding; rows without a scale are legacy float32"""
+    if scale is None:
+        return np.frombuffer(data, dtype=np.float32)
+    return np.frombuffer(data, dtype=np.int8).astype(np.float32) * scale
+
 class BlobDatabase:
+    # Shared SQL text so each connection's statement cache is hit on repeat calls.
+    # The timestamp is generated by SQLite (local time, as datetime.now() gave before)
+    _INSERT_BLOB_SQL = '''
+    INSERT INTO blobs (user_id, content_type, content, file_path, is_public, timestamp,
+                       embedding, embedding_norm, embedding_scale, ai_summary)
+    VALUES (?, ?, ?, ?, ?, datetime('now', 'localtime'), ?, ?, ?, ?)
+    '''
+    # The similarity scan only reads what scoring needs; content is fetched for the winners
+    _SEARCH_PUBLIC_SQL = '''
+    SELECT id, embedding, embedding_norm, embedding_scale
+    FROM blobs
+    WHERE is_public = 1 AND embedding IS NOT NULL
+    '''
+    _SEARCH_PRIVATE_SQL = '''
+    SELECT id, embedding, embedding_norm, embedding_scale
+    FROM blobs
+    WHERE user_id = ? AND embedding IS NOT NULL
+    '''
+    # Blob fields in Blob order; the embedding columns are never needed by callers
+    _BLOB_SELECT = '''
+    SELECT b.id, b.user_id, b.content_type, b.content, b.file_path, b.is_public,
+           b.timestamp, b.ai_summary, u.username
+    FROM blobs b
+    LEFT JOIN users u ON b.user_id = u.user_id
+    '''
+    _SEARCH_BATCH_SIZE = 1024
+    _EMBED_WORKERS = 4  # Embedding requests kept in flight by reprocess_embeddings
+    _EMBED_WRITE_SIZE = 100  # Embeddings written per transaction while reprocessing
+    _KNOWN_USERS_MAX = 10_000
+
     def __init__(self):
         # Use user's home directory for data storage
         self.data_dir = os.path.join(str(Path.home()), '.personalblobai')
@@ -17,18 +74,192 @@ class BlobDatabase:
         
         # Set up database path
         self.db_path = os.path.join(self.data_dir, 'blob_data.db')
+        # One connection per thread, opened lazily by the conn property
+        self._tls = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        # user_ids already confirmed present, so ensure_user_exists can skip the SELECT;
+        # kept in least-recently-used order so the oldest entry is evicted first
+        self._known_users = OrderedDict()
+        self._known_users_lock = threading.Lock()
+        self.vec_enabled = sqlite_vec is not None
+        self.vec_dim = None
+        # Memory-mapped copy of every embedding, so NumPy search doesn't re-read BLOBs per query
+        self.embedding_index = EmbeddingIndex(self.data_dir)
+        if not self.vec_enabled:
+            logger.info("sqlite-vec not installed, using NumPy similarity search")
         try:
-            self.conn = sqlite3.connect(self.db_path)
+            self.conn  # Open this thread's connection now so connection errors surface here
             logger.info(f"Database connected successfully at: {self.db_path}")
             self.create_tables()
             self.migrate_database()  # Add this line
+            if self.vec_enabled:
+                self._init_vec_table()
+            self._init_embedding_index()
         except sqlite3.Error as e:
             logger.error(f"Database connection error: {e}")
             raise
 
     def __del__(self):
-        if hasattr(self, 'conn'):
-            self.conn.close()
+        for conn in getattr(self, '_connections', []):
+            conn.close()
+
+    @property
+    def conn(self):
+        """Connection for the calling thread, created on first use"""
+        conn = getattr(self._tls, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            # WAL + relaxed sync: commits no longer fsync the main file each time,
+            # and readers on other threads don't block the writer
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA temp_store=MEMORY')
+            conn.execute('PRAGMA cache_size=-65536')
+            if self.vec_enabled:
+                self.vec_enabled = self._load_vec_extension(conn)
+            self._tls.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _load_vec_extension(self, conn):
+        """Load sqlite-vec so similarity search can run inside SQLite"""
+        try:
+            conn.enable_load_extension(True)
+            sqlite_vec.load(conn)
+            conn.enable_load_extension(False)
+            logger.debug("sqlite-vec extension loaded")
+            return True
+        except (sqlite3.Error, AttributeError) as e:
+            logger.warning(f"Could not load sqlite-vec, using NumPy similarity search: {e}")
+            return False
+
+    def _init_vec_table(self):
+        """Pick up the existing vec_blobs table, or create it from the stored embeddings"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT sql FROM sqlite_master WHERE name = 'vec_blobs'")
+        row = cursor.fetchone()
+        if row:
+            match = re.search(r'int8\[(\d+)\]', row[0])
+            if match:
+                self.vec_dim = int(match.group(1))
+                self._sync_vec_table()
+                self.conn.commit()
+                return
+            logger.info("Rebuilding vec_blobs index for int8 embeddings")
+            cursor.execute('DROP TABLE vec_blobs')
+
+        cursor.execute('SELECT embedding, embedding_scale FROM blobs WHERE embedding IS NOT NULL LIMIT 1')
+        row = cursor.fetchone()
+        if row:
+            self._create_vec_table(_decode_embedding(row[0], row[1]).size)
+        self.conn.commit()
+
+    def _create_vec_table(self, dim):
+        """Create the vec0 index mirroring blobs.embedding and fill it from existing rows (caller commits)"""
+        logger.info(f"Creating vec_blobs index with {dim} dimensions")
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS vec_blobs USING vec0(
+            blob_id INTEGER PRIMARY KEY,
+            embedding int8[{dim}] distance_metric=cosine,
+            user_id INTEGER,
+            is_public INTEGER
+        )''')
+        self._fill_vec_table(cursor, dim)
+        self.vec_dim = dim
+
+    def _fill_vec_table(self, cursor, dim, blob_ids=None):
+        """Insert the stored embeddings of blob_ids (all blobs if None) into vec_blobs"""
+        cursor.execute('''
+        SELECT id, embedding, embedding_scale, user_id, is_public
+        FROM blobs
+        WHERE embedding IS NOT NULL
+        ''')
+        rows = []
+        for blob_id, data, scale, owner_id, is_public in cursor.fetchall():
+            if blob_ids is not None and blob_id not in blob_ids:
+                continue
+            embedding = _decode_embedding(data, scale)
+            if embedding.size == dim:
+                rows.append((blob_id, _quantize_embedding(embedding)[0], owner_id, int(is_public or 0)))
+        cursor.executemany('''
+        INSERT INTO vec_blobs (blob_id, embedding, user_id, is_public)
+        VALUES (?, vec_int8(?), ?, ?)
+        ''', rows)
+
+    def _sync_vec_table(self):
+        """Bring an existing vec_blobs in line with blobs (caller commits)
+
+        Writes made while sqlite-vec wasn't loaded never reached vec_blobs, and the
+        KNN search would silently miss those blobs.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT id, is_public FROM blobs WHERE embedding IS NOT NULL')
+        stored = {blob_id: int(is_public or 0) for blob_id, is_public in cursor.fetchall()}
+        cursor.execute('SELECT blob_id, is_public FROM vec_blobs')
+        indexed = dict(cursor.fetchall())
+        # Rows deleted or made public/private since; changed ones are re-inserted below
+        stale = [blob_id for blob_id, is_public in indexed.items() if stored.get(blob_id) != is_public]
+        missing = {blob_id for blob_id, is_public in stored.items() if indexed.get(blob_id) != is_public}
+        if not stale and not missing:
+            return
+        logger.info(f"Syncing vec_blobs: {len(stale)} stale, {len(missing)} missing rows")
+        cursor.executemany('DELETE FROM vec_blobs WHERE blob_id = ?', [(blob_id,) for blob_id in stale])
+        if missing:
+            self._fill_vec_table(cursor, self.vec_dim, missing)
+
+    def _index_embedding(self, cursor, blob_id, embedding_bytes):
+        """Mirror a blob's int8 embedding into vec_blobs (caller commits)"""
+        if not self.vec_enabled:
+            return
+        try:
+            if self.vec_dim is None:
+                self._create_vec_table(len(embedding_bytes))
+            if len(embedding_bytes) != self.vec_dim:
+                logger.warning(f"Embedding for blob {blob_id} has {len(embedding_bytes)} dims, index has {self.vec_dim}")
+                return
+            cursor.execute('DELETE FROM vec_blobs WHERE blob_id = ?', (blob_id,))
+            cursor.execute('''
+            INSERT INTO vec_blobs (blob_id, embedding, user_id, is_public)
+            SELECT id, vec_int8(?), user_id, CAST(is_public AS INTEGER) FROM blobs WHERE id = ?
+            ''', (embedding_bytes, blob_id))
+        except sqlite3.Error as e:
+            if 'no such table' in str(e):
+                # The transaction that created vec_blobs was rolled back; the next write
+                # creates it again and backfills this blob from the blobs table
+                self.vec_dim = None
+            logger.error(f"Error indexing embedding for blob {blob_id}: {e}")
+
+    def _init_embedding_index(self):
+        """Open the side-car embedding matrix, rebuilding it if it doesn't match the blobs table"""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT id, user_id, is_public FROM blobs WHERE embedding IS NOT NULL')
+        if self.embedding_index.load(cursor.fetchall()):
+            return
+        cursor.execute('''
+        SELECT id, user_id, is_public, embedding, embedding_scale
+        FROM blobs WHERE embedding IS NOT NULL
+        ''')
+        self.embedding_index.rebuild(
+            (blob_id, owner_id, is_public, _decode_embedding(data, scale))
+            for blob_id, owner_id, is_public, data, scale in cursor.fetchall()
+        )
+
+    def _refresh_embedding_index(self, blob_ids):
+        """Copy the stored embeddings of blob_ids into the side-car index"""
+        if not blob_ids:
+            return
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+        SELECT id, user_id, is_public, embedding, embedding_scale FROM blobs
+        WHERE embedding IS NOT NULL AND id IN ({', '.join('?' * len(blob_ids))})
+        ''', list(blob_ids))
+        self.embedding_index.upsert(
+            (blob_id, owner_id, is_public, _decode_embedding(data, scale))
+            for blob_id, owner_id, is_public, data, scale in cursor.fetchall()
+        )
 
     def create_tables(self):
         cursor = self.conn.cursor()
@@ -55,6 +286,8 @@ class BlobDatabase:
             timestamp DATETIME,
             ai_summary TEXT,
             embedding BLOB,
+            embedding_norm REAL,
+            embedding_scale REAL,
             FOREIGN KEY (user_id) REFERENCES users(user_id)
         )''')
         self.conn.commit()
@@ -77,8 +310,49 @@ class BlobDatabase:
                 logger.error(f"Migration error: {e}")
                 raise
 
+        if 'embedding_norm' not in columns:
+            logger.info("Migrating database to add embedding_norm column")
+            try:
+                cursor.execute("ALTER TABLE blobs ADD COLUMN embedding_norm REAL")
+                self.conn.commit()
+                logger.info("Successfully added embedding_norm column")
+            except sqlite3.Error as e:
+                logger.error(f"Migration error: {e}")
+                raise
+
+        if 'embedding_scale' not in columns:
+            logger.info("Migrating database to add embedding_scale column")
+            try:
+                cursor.execute("ALTER TABLE blobs ADD COLUMN embedding_scale REAL")
+                self.conn.commit()
+                logger.info("Successfully added embedding_scale column")
+            except sqlite3.Error as e:
+                logger.error(f"Migration error: {e}")
+                raise
+
+        # Indexes for per-user listings, public listings and embedding scans
+        # (created here rather than in create_tables since they need the migrated columns)
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_blobs_user_ts ON blobs(user_id, timestamp DESC)')
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_blobs_public_ts ON blobs(is_public, timestamp DESC)
+        WHERE is_public = 1
+        ''')
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_blobs_user_embed ON blobs(user_id)
+        WHERE embedding IS NOT NULL
+        ''')
+
+        # Refresh planner statistics so the new indexes get picked up
+        cursor.execute("ANALYZE")
+        self.conn.commit()
+
     def ensure_user_exists(self, user_id, username=None, first_name=None, last_name=None):
         """Ensure user exists in database, create if not"""
+        with self._known_users_lock:
+            if user_id in self._known_users:
+                self._known_users.move_to_end(user_id)
+                return user_id
+            
         cursor = self.conn.cursor()
         cursor.execute('SELECT user_id FROM users WHERE user_id = ?', (user_id,))
         if not cursor.fetchone():
@@ -88,27 +362,50 @@ class BlobDatabase:
             VALUES (?, ?, ?, ?)
             ''', (user_id, username, first_name, last_name))
             self.conn.commit()
+
+        with self._known_users_lock:
+            self._known_users[user_id] = None
+            self._known_users.move_to_end(user_id)
+            if len(self._known_users) > self._KNOWN_USERS_MAX:
+                self._known_users.popitem(last=False)
         return user_id
 
-    def store_blob(self, user_id, content_type, content, file_path="", is_public=False, embedding=None):
+    def store_blob(self, user_id, content_type, content, file_path="", is_public=False, embedding=None, summary=None):
         logger.info(f"Storing new blob for user {user_id} of type {content_type}")
+        blob_id = self.store_blobs([(user_id, content_type, content, file_path, is_public, embedding, summary)])[0]
+        logger.info(f"Successfully stored blob with ID {blob_id}")
+        return blob_id
+
+    def store_blobs(self, rows):
+        """Insert (user_id, content_type, content, file_path, is_public, embedding, summary) rows
+        in a single transaction and return their new IDs"""
         try:
-            if embedding is not None:
-                embedding_bytes = embedding.tobytes()
-                logger.debug(f"Embedding size: {len(embedding_bytes)} bytes")
-            else:
-                embedding_bytes = None
-                logger.warning("No embedding provided for content")
-                
-            cursor = self.conn.cursor()
-            cursor.execute('''
-            INSERT INTO blobs (user_id, content_type, content, file_path, is_public, timestamp, embedding)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (user_id, content_type, content, file_path, is_public, datetime.now(), embedding_bytes))
-            blob_id = cursor.lastrowid
-            self.conn.commit()
-            logger.info(f"Successfully stored blob with ID {blob_id}")
-            return blob_id
+            params = []
+            for user_id, content_type, content, file_path, is_public, embedding, summary in rows:
+                if embedding is not None:
+                    embedding_bytes, embedding_scale, embedding_norm = _quantize_embedding(embedding)
+                    logger.debug(f"Embedding size: {len(embedding_bytes)} bytes")
+                else:
+                    embedding_bytes = None
+                    embedding_scale = None
+                    embedding_norm = None
+                    logger.warning("No embedding provided for content")
+                params.append((user_id, content_type, content, file_path, is_public,
+                               embedding_bytes, embedding_norm, embedding_scale, summary))
+
+            blob_ids = []
+            with self.conn:
+                cursor = self.conn.cursor()
+                # One execute per row rather than executemany, so each new ID is known
+                # for the caller and the vec index; the single commit is what matters
+                for row in params:
+                    cursor.execute(self._INSERT_BLOB_SQL, row)
+                    blob_id = cursor.lastrowid
+                    blob_ids.append(blob_id)
+                    if row[5] is not None:
+                        self._index_embedding(cursor, blob_id, row[5])
+            self._refresh_embedding_index([blob_id for blob_id, row in zip(blob_ids, params) if row[5] is not None])
+            return blob_ids
         except Exception as e:
             logger.error(f"Error storing blob: {e}")
             raise
@@ -118,34 +415,40 @@ class BlobDatabase:
         cursor.execute('UPDATE blobs SET ai_summary = ? WHERE id = ?', (summary, blob_id))
         self.conn.commit()
 
-    def get_user_blobs(self, user_id, is_public=None):
-        """Get blobs for specific user"""
+    def get_user_blobs(self, user_id, is_public=None, limit=50, offset=0):
+        """Get a page of blobs for specific user, newest first"""
         cursor = self.conn.cursor()
         if is_public is None:
             # Get user's private blobs and all public blobs
-            cursor.execute('''
-            SELECT b.*, u.username 
-            FROM blobs b
-            LEFT JOIN users u ON b.user_id = u.user_id
+            cursor.execute(self._BLOB_SELECT + '''
             WHERE b.user_id = ? OR b.is_public = 1
-            ORDER BY b.timestamp DESC
-            ''', (user_id,))
+            ORDER BY b.timestamp DESC, b.id DESC
+            LIMIT ? OFFSET ?
+            ''', (user_id, limit, offset))
         else:
             # Get only public or private blobs
-            cursor.execute('''
-            SELECT b.*, u.username 
-            FROM blobs b
-            LEFT JOIN users u ON b.user_id = u.user_id
+            cursor.execute(self._BLOB_SELECT + '''
             WHERE (b.user_id = ? OR b.is_public = 1) AND b.is_public = ?
-            ORDER BY b.timestamp DESC
-            ''', (user_id, is_public))
-        return cursor.fetchall()
+            ORDER BY b.timestamp DESC, b.id DESC
+            LIMIT ? OFFSET ?
+            ''', (user_id, is_public, limit, offset))
+        return list(map(Blob._make, cursor.fetchall()))
 
     def get_blob_by_id(self, blob_id, user_id):
         cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM blobs WHERE id = ? AND (user_id = ? OR is_public = 1)', 
+        cursor.execute(self._BLOB_SELECT + 'WHERE b.id = ? AND (b.user_id = ? OR b.is_public = 1)',
                       (blob_id, user_id))
-        return cursor.fetchone()
+        row = cursor.fetchone()
+        return Blob._make(row) if row else None
+
+    def get_blob_embedding(self, blob_id):
+        """Return the stored embedding of a blob as float32, or None"""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT embedding, embedding_scale FROM blobs WHERE id = ?', (blob_id,))
+        row = cursor.fetchone()
+        if not row or row[0] is None:
+            return None
+        return _decode_embedding(row[0], row[1])
 
     def update_publicity(self, blob_id, is_public, user_id):
         logger.info(f"Updating publicity for blob {blob_id} to {is_public} by user {user_id}")
@@ -159,97 +462,241 @@ class BlobDatabase:
         if cursor.rowcount == 0:
             logger.warning(f"Failed to update blob {blob_id} - not found or unauthorized")
             raise ValueError("Blob not found or you don't have permission to modify it")
+
+        if self.vec_enabled and self.vec_dim is not None:
+            cursor.execute('UPDATE vec_blobs SET is_public = ? WHERE blob_id = ?', (int(is_public), blob_id))
         
         self.conn.commit()
+        self.embedding_index.set_public(blob_id, is_public)
         logger.info(f"Successfully updated blob {blob_id} publicity")
         return True
 
     def update_embedding(self, blob_id, embedding):
-        cursor = self.conn.cursor()
-        cursor.execute('UPDATE blobs SET embedding = ? WHERE id = ?', 
-                      (embedding.tobytes(), blob_id))
-        self.conn.commit()
+        self.update_embeddings([(blob_id, embedding)])
+
+    def update_embeddings(self, embeddings):
+        """Persist (blob_id, embedding) pairs in a single transaction"""
+        quantized = [(blob_id,) + _quantize_embedding(embedding) for blob_id, embedding in embeddings]
+        with self.conn:
+            cursor = self.conn.cursor()
+            cursor.executemany(
+                'UPDATE blobs SET embedding = ?, embedding_scale = ?, embedding_norm = ? WHERE id = ?',
+                ((data, scale, embedding_norm, blob_id) for blob_id, data, scale, embedding_norm in quantized)
+            )
+            for blob_id, data, _, _ in quantized:
+                self._index_embedding(cursor, blob_id, data)
+        self._refresh_embedding_index([blob_id for blob_id, _, _, _ in quantized])
+        return len(quantized)
 
     def search_similar_blobs(self, query_embedding, user_id, limit=5, public_only=False):
         """Search for similar blobs with scope control"""
         if query_embedding is None:
             logger.warning("Received null query embedding")
             return []
-            
+
+        if self.vec_enabled and self.vec_dim == query_embedding.size:
+            try:
+                return self._search_similar_vec(query_embedding, user_id, limit, public_only)
+            except sqlite3.Error as e:
+                logger.error(f"sqlite-vec search failed, falling back to NumPy: {e}")
+
+        if self.embedding_index.dim == query_embedding.size:
+            best_ids, best_scores = self.embedding_index.search(
+                query_embedding, limit, owner_id=user_id, public_only=public_only
+            )
+            return self._fetch_search_results(best_ids, best_scores)
+
+        # Dimension mismatch with the side-car: score straight from the blobs table
         cursor = self.conn.cursor()
         
         if public_only:
             # Search all public blobs
-            query = '''
-            SELECT b.id, b.content, b.content_type, b.ai_summary, b.embedding, b.is_public, u.username, b.user_id
-            FROM blobs b
-            LEFT JOIN users u ON b.user_id = u.user_id
-            WHERE b.is_public = 1 AND b.embedding IS NOT NULL
-            '''
-            cursor.execute(query)
+            cursor.execute(self._SEARCH_PUBLIC_SQL)
         else:
             # Search only user's private blobs
-            query = '''
-            SELECT b.id, b.content, b.content_type, b.ai_summary, b.embedding, b.is_public, u.username, b.user_id
-            FROM blobs b
-            LEFT JOIN users u ON b.user_id = u.user_id
-            WHERE b.user_id = ? AND b.embedding IS NOT NULL
-            '''
-            cursor.execute(query, (user_id,))
+            cursor.execute(self._SEARCH_PRIVATE_SQL, (user_id,))
         
+        # Stream the scan in batches, keeping only the running top `limit` candidates
+        dim = query_embedding.size
+        query = query_embedding.astype(np.float32)
+        best_ids = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+        while True:
+            rows = cursor.fetchmany(self._SEARCH_BATCH_SIZE)
+            if not rows:
+                break
+            ids, scores = self._score_rows(rows, query, dim)
+            best_ids = np.concatenate([best_ids, ids])
+            best_scores = np.concatenate([best_scores, scores])
+            # Partial sort: only the top `limit` entries need to survive
+            if len(best_scores) > limit:
+                keep = np.argpartition(-best_scores, limit)[:limit]
+                best_ids, best_scores = best_ids[keep], best_scores[keep]
+
+        order = np.argsort(-best_scores)
+        return self._fetch_search_results(best_ids[order].tolist(), best_scores[order].tolist())
+
+    def _fetch_search_results(self, best_ids, best_scores):
+        """Fetch content for the ranked winners of a similarity search"""
+        return self._search_results(best_ids, best_scores, self._fetch_blob_details(best_ids))
+
+    def _fetch_blob_details(self, blob_ids):
+        """Map blob id -> (id, content, content_type, ai_summary)"""
+        if not blob_ids:
+            return {}
+        blob_ids = list(blob_ids)
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+        SELECT id, content, content_type, ai_summary FROM blobs
+        WHERE id IN ({', '.join('?' * len(blob_ids))})
+        ''', blob_ids)
+        return {row[0]: row for row in cursor.fetchall()}
+
+    @staticmethod
+    def _search_results(best_ids, best_scores, details):
         results = []
-        for row in cursor.fetchall():
-            try:
-                if row[4] is None:  # embedding
-                    continue
-                    
-                blob_embedding = np.frombuffer(row[4], dtype=np.float32)
-                if blob_embedding.size == 0:
-                    continue
-                    
-                similarity = np.dot(query_embedding, blob_embedding) / (
-                    norm(query_embedding) * norm(blob_embedding) + 1e-9
-                )
-                results.append((similarity, row))
-                logger.debug(f"Similarity score for blob {row[0]} (owned by {row[6]}): {similarity}")
-            except Exception as e:
-                logger.error(f"Error processing blob {row[0]}: {e}")
-                continue
-        
-        # Sort by similarity and return top results
-        results.sort(reverse=True, key=lambda x: x[0])
-        return [(r[1][0], r[1][1], r[1][2], r[1][3], r[0]) for r in results[:limit]]
+        for blob_id, similarity in zip(best_ids, best_scores):
+            logger.debug(f"Similarity score for blob {blob_id}: {similarity}")
+            row = details[blob_id]
+            results.append(SearchResult(row[0], row[1], row[2], row[3], float(similarity)))
+        return results
+
+    def search_similar_blobs_dual(self, query_embedding, user_id, limit_private=5, limit_public=5):
+        """Search the user's blobs and public blobs together; returns (private_results, public_results)"""
+        if query_embedding is None:
+            logger.warning("Received null query embedding")
+            return [], []
+
+        if self.embedding_index.dim != query_embedding.size or (self.vec_enabled and self.vec_dim == query_embedding.size):
+            # The vec KNN and SQLite scan paths work per scope
+            return (self.search_similar_blobs(query_embedding, user_id, limit=limit_private, public_only=False),
+                    self.search_similar_blobs(query_embedding, user_id, limit=limit_public, public_only=True))
+
+        (private_ids, private_scores), (public_ids, public_scores) = self.embedding_index.search_dual(
+            query_embedding, user_id, limit_private, limit_public
+        )
+        # One content fetch for both scopes; a blob can appear in both
+        details = self._fetch_blob_details(set(private_ids) | set(public_ids))
+        return (self._search_results(private_ids, private_scores, details),
+                self._search_results(public_ids, public_scores, details))
+
+    @staticmethod
+    def _score_rows(rows, query, dim):
+        """Cosine similarity for a batch of (id, embedding, norm, scale) rows"""
+        quantized = [row for row in rows if row[3] is not None and len(row[1]) == dim]
+        legacy = [row for row in rows if row[3] is None and row[1] and len(row[1]) == dim * 4]
+
+        # Score each storage format with a single matmul over its stacked (N, D) matrix
+        ids, dots, norms = [], [], []
+        if quantized:
+            # int8 codes are rescaled per row after the matmul
+            codes = np.frombuffer(b''.join(row[1] for row in quantized), dtype=np.int8).reshape(-1, dim)
+            scales = np.array([row[3] for row in quantized], dtype=np.float32)
+            ids.extend(row[0] for row in quantized)
+            dots.append((codes.astype(np.float32) @ query) * scales)
+            norms.append(np.array([row[2] for row in quantized], dtype=np.float32))
+        if legacy:
+            # float32 rows stored before quantization; reprocess_embeddings converts them
+            matrix = np.frombuffer(b''.join(row[1] for row in legacy), dtype=np.float32).reshape(-1, dim)
+            ids.extend(row[0] for row in legacy)
+            dots.append(matrix @ query)
+            norms.append(np.sqrt(np.einsum('ij,ij->i', matrix, matrix)))
+        if not ids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        similarities = np.concatenate(dots) / (np.sqrt(query @ query) * np.concatenate(norms) + 1e-9)
+        return np.array(ids, dtype=np.int64), similarities.astype(np.float32)
+
+    def _search_similar_vec(self, query_embedding, user_id, limit, public_only):
+        """KNN search inside SQLite using the vec_blobs index"""
+        scope = 'is_public = 1' if public_only else 'user_id = ?'
+        params = [_quantize_embedding(query_embedding)[0], limit]
+        if not public_only:
+            params.append(user_id)
+
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+        WITH knn AS (
+            SELECT blob_id, distance
+            FROM vec_blobs
+            WHERE embedding MATCH vec_int8(?) AND k = ? AND {scope}
+        )
+        SELECT b.id, b.content, b.content_type, b.ai_summary, knn.distance
+        FROM knn
+        JOIN blobs b ON b.id = knn.blob_id
+        ORDER BY knn.distance
+        ''', params)
+        # Cosine distance -> cosine similarity
+        return [SearchResult(row[0], row[1], row[2], row[3], 1.0 - row[4]) for row in cursor.fetchall()]
 
     def get_blobs_without_embeddings(self):
         cursor = self.conn.cursor()
         cursor.execute('SELECT id, content, content_type FROM blobs WHERE embedding IS NULL')
         return cursor.fetchall()
 
-    def reprocess_embeddings(self, get_embedding_func):
-        """Reprocess all blobs without embeddings"""
+    def backfill_embeddings(self):
+        """Quantize legacy float32 embeddings and fill in missing norms"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+        SELECT id, embedding, embedding_scale FROM blobs
+        WHERE embedding IS NOT NULL AND (embedding_scale IS NULL OR embedding_norm IS NULL)
+        ''')
+        updates = []
+        for blob_id, data, scale in cursor.fetchall():
+            updates.append(_quantize_embedding(_decode_embedding(data, scale)) + (blob_id,))
+        if updates:
+            cursor.executemany(
+                'UPDATE blobs SET embedding = ?, embedding_scale = ?, embedding_norm = ? WHERE id = ?',
+                updates
+            )
+            self.conn.commit()
+            self._refresh_embedding_index([update[-1] for update in updates])
+            logger.info(f"Backfilled quantized embeddings for {len(updates)} blobs")
+        return len(updates)
+
+    def reprocess_embeddings(self, get_embedding_func, batch_size=32, batch_embed_func=None):
+        """Reprocess all blobs without embeddings, in batches when batch_embed_func is given"""
         logger.info("Starting embedding reprocessing")
+        self.backfill_embeddings()
         blobs = self.get_blobs_without_embeddings()
         
         if not blobs:
             logger.info("No blobs found that need embedding reprocessing")
             return 0
             
+        if batch_embed_func is None:
+            # One request per blob, so a failure only skips that blob
+            batch_size = 1
+            batch_embed_func = lambda texts: [get_embedding_func(text) for text in texts]
+        batches = [blobs[start:start + batch_size] for start in range(0, len(blobs), batch_size)]
+
+        # Keep several embedding requests in flight; this thread is the only database writer
         processed = 0
-        for blob_id, content, content_type in blobs:
-            try:
-                logger.info(f"Processing embedding for blob {blob_id}")
-                embedding = get_embedding_func(content)
-                
-                if embedding is not None:
-                    self.update_embedding(blob_id, embedding)
-                    processed += 1
-                    logger.info(f"Successfully updated embedding for blob {blob_id}")
-                else:
-                    logger.warning(f"Failed to generate embedding for blob {blob_id}")
-                    
-            except Exception as e:
-                logger.error(f"Error processing blob {blob_id}: {e}")
-                continue
+        embeddings = []
+        with ThreadPoolExecutor(max_workers=self._EMBED_WORKERS) as executor:
+            futures = {}
+            for batch in batches:
+                logger.info(f"Processing embeddings for {len(batch)} blobs starting at {batch[0][0]}")
+                futures[executor.submit(batch_embed_func, [content for _, content, _ in batch])] = batch
+
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    vectors = future.result()
+                except Exception as e:
+                    logger.error(f"Error processing batch starting at blob {batch[0][0]}: {e}")
+                    continue
+
+                for (blob_id, _, _), embedding in zip(batch, vectors):
+                    if embedding is not None:
+                        embeddings.append((blob_id, embedding))
+                    else:
+                        logger.warning(f"Failed to generate embedding for blob {blob_id}")
+                if len(embeddings) >= self._EMBED_WRITE_SIZE:
+                    processed += self.update_embeddings(embeddings)
+                    embeddings = []
+
+        processed += self.update_embeddings(embeddings)
                 
         logger.info(f"Completed embedding reprocessing. Updated {processed} blobs")
         return processed
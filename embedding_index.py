@@ -0,0 +1,298 @@
+import os
+import threading
+import logging
+import numpy as np
+
+try:
+    from numba import njit, prange
+except ImportError:  # Optional: fall back to NumPy gather + matmul
+    njit = None
+
+try:
+    import hnswlib
+except ImportError:  # Optional: exact search only
+    hnswlib = None
+
+logger = logging.getLogger(__name__)
+
+if njit is not None:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _candidate_scores(matrix, candidates, query, out):
+        """Dot each candidate row with the query without gathering a copy of the rows"""
+        for j in prange(candidates.shape[0]):
+            row = candidates[j]
+            s = 0.0
+            for d in range(matrix.shape[1]):
+                s += matrix[row, d] * query[d]
+            out[j] = s
+else:
+    _candidate_scores = None
+
+# Scopes with fewer candidates than this are scored exactly; an HNSW query only pays off above it
+ANN_MIN_CANDIDATES = 20_000
+ANN_FANOUT = 4  # Neighbours fetched per requested result, to survive the scope post-filter
+
+class EmbeddingIndex:
+    """Side-car copy of all blob embeddings as one memory-mapped (N, D) float32 matrix.
+
+    Rows are unit-normalized so a search is a single `matrix @ query`. Row i belongs
+    to blob ids[i]; owners/public mirror the blobs table so scope filtering never
+    has to touch SQLite. The database stays the source of truth: if the side-car
+    doesn't match it on startup, BlobDatabase rebuilds it.
+    """
+
+    def __init__(self, data_dir):
+        self.matrix_path = os.path.join(data_dir, 'embeddings.f32')
+        self.ids_path = os.path.join(data_dir, 'embedding_ids.npz')
+        self.dim = None
+        self.ids = np.empty(0, dtype=np.int64)
+        self.owners = np.empty(0, dtype=np.int64)
+        self.public = np.empty(0, dtype=bool)
+        self._rows = {}  # blob_id -> row index
+        self._matrix = None
+        self._lock = threading.Lock()
+        # Optional HNSW graph over the same rows (hnswlib), built in the background on first need
+        self._ann = None
+        self._ann_building = False
+        self._ann_pending = set()  # blob_ids upserted while the graph was being built
+        self._generation = 0  # bumped by load()/rebuild() so a stale build is discarded
+
+    def load(self, meta):
+        """Open the existing side-car files; meta is [(blob_id, user_id, is_public)] from the database.
+
+        Returns False when the files are missing or don't match meta, in which case
+        the caller should rebuild().
+        """
+        if not os.path.exists(self.matrix_path) or not os.path.exists(self.ids_path):
+            return False
+        try:
+            with np.load(self.ids_path) as saved:
+                ids, dim = saved['ids'], int(saved['dim'])
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Could not read embedding index ids: {e}")
+            return False
+
+        if len(ids) == 0 or os.path.getsize(self.matrix_path) != len(ids) * dim * 4:
+            return False
+        if sorted(ids.tolist()) != sorted(blob_id for blob_id, _, _ in meta):
+            logger.info("Embedding index is out of date with the database")
+            return False
+
+        by_id = {blob_id: (owner_id, is_public) for blob_id, owner_id, is_public in meta}
+        with self._lock:
+            self.dim = dim
+            self.ids = ids.astype(np.int64)
+            self.owners = np.array([by_id[i][0] or 0 for i in self.ids.tolist()], dtype=np.int64)
+            self.public = np.array([bool(by_id[i][1]) for i in self.ids.tolist()], dtype=bool)
+            self._rows = {blob_id: row for row, blob_id in enumerate(self.ids.tolist())}
+            self._matrix = None
+            self._reset_ann()
+        logger.info(f"Loaded embedding index with {len(self.ids)} rows of {self.dim} dims")
+        return True
+
+    def rebuild(self, rows):
+        """Rewrite the side-car from (blob_id, user_id, is_public, embedding) rows"""
+        rows = [row for row in rows if row[3] is not None and row[3].size]
+        with self._lock:
+            self.dim = rows[0][3].size if rows else None
+            rows = [row for row in rows if row[3].size == self.dim]
+            with open(self.matrix_path, 'wb') as f:
+                for row in rows:
+                    f.write(self._normalize(row[3]).tobytes())
+            self.ids = np.array([row[0] for row in rows], dtype=np.int64)
+            self.owners = np.array([row[1] or 0 for row in rows], dtype=np.int64)
+            self.public = np.array([bool(row[2]) for row in rows], dtype=bool)
+            self._rows = {blob_id: row for row, blob_id in enumerate(self.ids.tolist())}
+            self._matrix = None
+            self._reset_ann()
+            self._save_ids()
+        logger.info(f"Rebuilt embedding index with {len(rows)} rows")
+
+    def upsert(self, entries):
+        """Add or overwrite (blob_id, user_id, is_public, embedding) entries"""
+        entries = list(entries)
+        with self._lock:
+            appended = []
+            for blob_id, owner_id, is_public, embedding in entries:
+                if self.dim is None:
+                    self.dim = embedding.size
+                if embedding.size != self.dim:
+                    logger.warning(f"Not indexing blob {blob_id}: {embedding.size} dims, index has {self.dim}")
+                    continue
+                data = self._normalize(embedding).tobytes()
+                row = self._rows.get(blob_id)
+                if row is None:
+                    with open(self.matrix_path, 'ab') as f:
+                        f.write(data)
+                    self._rows[blob_id] = len(self.ids) + len(appended)
+                    appended.append((blob_id, owner_id or 0, bool(is_public)))
+                else:
+                    # Overwrite the row in place; the read-only memmap sees the new bytes
+                    with open(self.matrix_path, 'r+b') as f:
+                        f.seek(row * self.dim * 4)
+                        f.write(data)
+                    self.owners[row] = owner_id or 0
+                    self.public[row] = bool(is_public)
+
+            if appended:
+                self.ids = np.concatenate([self.ids, np.array([a[0] for a in appended], dtype=np.int64)])
+                self.owners = np.concatenate([self.owners, np.array([a[1] for a in appended], dtype=np.int64)])
+                self.public = np.concatenate([self.public, np.array([a[2] for a in appended], dtype=bool)])
+                self._matrix = None
+                self._save_ids()
+            self._ann_add([blob_id for blob_id, _, _, embedding in entries if embedding.size == self.dim])
+
+    def set_public(self, blob_id, is_public):
+        with self._lock:
+            row = self._rows.get(blob_id)
+            if row is not None:
+                self.public[row] = bool(is_public)
+
+    def search(self, query, limit, owner_id=None, public_only=False):
+        """Return (blob_ids, similarities) of the top `limit` matches, best first"""
+        with self._lock:
+            matrix = self._get_matrix()
+            candidates = np.flatnonzero(self.public if public_only else self.owners == owner_id)
+            ids = self.ids
+        if matrix is None or not len(candidates):
+            return [], []
+
+        query = self._normalize(query)
+        if len(candidates) >= ANN_MIN_CANDIDATES:
+            found = self._search_ann(query, limit, owner_id, public_only)
+            if found is not None:
+                return found
+
+        scores = self._score(matrix, candidates, query)
+        top = self._top(scores, limit)
+        return ids[candidates[top]].tolist(), scores[top].tolist()
+
+    def _search_ann(self, query, limit, owner_id, public_only):
+        """Approximate top `limit` from the HNSW graph, or None to fall back to the exact scan"""
+        if hnswlib is None:
+            return None
+        with self._lock:
+            if self._ann is None:
+                if not self._ann_building:
+                    self._start_ann_build()
+                return None
+            k = min(limit * ANN_FANOUT, self._ann.get_current_count())
+            self._ann.set_ef(max(k, 50))
+            labels, distances = self._ann.knn_query(query, k=k)
+            rows = [self._rows[blob_id] for blob_id in labels[0].tolist()]
+            in_scope = self.public[rows] if public_only else self.owners[rows] == owner_id
+
+        # Inner-product distance on unit vectors is 1 - cosine similarity
+        blob_ids = labels[0][in_scope][:limit]
+        if len(blob_ids) < limit:
+            return None  # Too few neighbours in scope; the exact scan will find them
+        return blob_ids.tolist(), (1.0 - distances[0][in_scope][:limit]).tolist()
+
+    def _reset_ann(self):
+        """Drop the HNSW graph after the rows were replaced (caller holds the lock)"""
+        self._ann = None
+        self._ann_pending = set()
+        self._generation += 1
+
+    def _start_ann_build(self):
+        """Build the HNSW graph from a snapshot of the matrix in a worker thread (caller holds the lock)"""
+        self._ann_building = True
+        self._ann_pending = set()
+        threading.Thread(
+            target=self._build_ann,
+            args=(self._get_matrix(), self.ids, self.dim, self._generation),
+            daemon=True,
+        ).start()
+
+    def _build_ann(self, matrix, ids, dim, generation):
+        try:
+            logger.info(f"Building HNSW index over {len(ids)} embeddings")
+            ann = hnswlib.Index(space='ip', dim=dim)
+            ann.init_index(max_elements=max(2 * len(ids), 1024), ef_construction=64, M=16)
+            ann.add_items(matrix, ids)
+            with self._lock:
+                if generation != self._generation:
+                    return
+                self._ann = ann
+                self._ann_add(self._ann_pending)
+                self._ann_pending = set()
+            logger.info("HNSW index ready")
+        except Exception as e:
+            logger.error(f"Failed to build HNSW index: {e}")
+        finally:
+            with self._lock:
+                self._ann_building = False
+
+    def _ann_add(self, blob_ids):
+        """Copy rows into the HNSW graph, replacing existing labels (caller holds the lock)"""
+        if self._ann_building and self._ann is None:
+            self._ann_pending.update(blob_ids)
+            return
+        if self._ann is None or not blob_ids:
+            return
+        rows = [self._rows[blob_id] for blob_id in blob_ids]
+        needed = self._ann.get_current_count() + len(rows)
+        if needed > self._ann.get_max_elements():
+            self._ann.resize_index(2 * needed)
+        self._ann.add_items(self._get_matrix()[rows], list(blob_ids))
+
+    def search_dual(self, query, owner_id, limit_private, limit_public):
+        """Search the owner's blobs and all public blobs with one scoring pass.
+
+        Returns ((private_ids, private_sims), (public_ids, public_sims)), best first.
+        """
+        with self._lock:
+            matrix = self._get_matrix()
+            private = self.owners == owner_id
+            public = self.public.copy()
+            ids = self.ids
+        candidates = np.flatnonzero(private | public)
+        if matrix is None or not len(candidates):
+            return ([], []), ([], [])
+
+        scores = self._score(matrix, candidates, self._normalize(query))
+        results = []
+        for mask, limit in ((private[candidates], limit_private), (public[candidates], limit_public)):
+            subset = np.flatnonzero(mask)
+            top = subset[self._top(scores[subset], limit)]
+            results.append((ids[candidates[top]].tolist(), scores[top].tolist()))
+        return tuple(results)
+
+    @staticmethod
+    def _score(matrix, candidates, query):
+        """Similarity of each candidate row to a unit-normalized query"""
+        if _candidate_scores is not None:
+            scores = np.empty(len(candidates), dtype=np.float32)
+            _candidate_scores(matrix, candidates, query, scores)
+            return scores
+        if len(candidates) * 2 > len(matrix):
+            return (matrix @ query)[candidates]
+        return matrix[candidates] @ query
+
+    @staticmethod
+    def _top(scores, limit):
+        """Indices of the `limit` best scores, best first"""
+        # Partial sort: only the top `limit` entries need ordering
+        if limit < len(scores):
+            top = np.argpartition(-scores, limit)[:limit]
+        else:
+            top = np.arange(len(scores))
+        return top[np.argsort(-scores[top])]
+
+    def _get_matrix(self):
+        """Memory-map the side-car file (caller holds the lock)"""
+        if self._matrix is None and len(self.ids):
+            self._matrix = np.memmap(self.matrix_path, dtype=np.float32, mode='r',
+                                     shape=(len(self.ids), self.dim))
+        return self._matrix
+
+    def _save_ids(self):
+        """Persist the row -> blob_id map next to the matrix (caller holds the lock)"""
+        with open(self.ids_path, 'wb') as f:
+            np.savez(f, ids=self.ids, dim=self.dim or 0)
+
+    @staticmethod
+    def _normalize(embedding):
+        embedding = np.asarray(embedding, dtype=np.float32)
+        # Called per row on rebuild/upsert: sqrt(dot) avoids np.linalg.norm's dispatch overhead
+        return embedding / (np.sqrt(embedding @ embedding) + 1e-9)
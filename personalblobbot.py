@@ -1,3 +1,5 @@
+import asyncio
+import hashlib
 import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, ContextTypes, MessageHandler, filters, CallbackQueryHandler
@@ -5,13 +7,17 @@ from config import BOT_TOKEN
 from database import BlobDatabase
 from summary_agent import generate_summary
 import os
-from query_agent import query_blob, get_embedding, query_database
-from vision_agent import analyze_image
+from query_agent import query_blob, get_embedding, get_embeddings, query_database
+from vision_agent import analyze_image_async
 from pathlib import Path
 import re  # Add this import at the top
-from openai import OpenAI
+import time
+import itertools
+from collections import OrderedDict
+from openai import AsyncOpenAI
 from datetime import datetime
 from audio_agent import AudioGenerator
+from semantic_cache import SemanticCache
 
 # Add these constants near the top
 MAX_MESSAGE_LENGTH = 4096
@@ -25,21 +31,30 @@ async def split_and_send_message(message, text, reply_markup=None):
             return await message.reply_text(text, reply_markup=reply_markup)
             
         parts = []
-        current_part = ""
+        # Paragraphs of the part being built and the length they will have once joined,
+        # so each part is joined once instead of re-concatenated per paragraph
+        current = []
+        current_len = 0
         
         # Split on paragraphs
         paragraphs = text.split(SPLIT_MARKER)
         
         for paragraph in paragraphs:
-            if len(current_part) + len(paragraph) + len(SPLIT_MARKER) <= MAX_MESSAGE_LENGTH:
-                current_part += (SPLIT_MARKER if current_part else "") + paragraph
+            if current_len + len(paragraph) + len(SPLIT_MARKER) <= MAX_MESSAGE_LENGTH:
+                if current_len:
+                    current.append(paragraph)
+                    current_len += len(SPLIT_MARKER) + len(paragraph)
+                else:
+                    current = [paragraph]
+                    current_len = len(paragraph)
             else:
-                if current_part:
-                    parts.append(current_part)
-                current_part = paragraph
+                if current_len:
+                    parts.append(SPLIT_MARKER.join(current))
+                current = [paragraph]
+                current_len = len(paragraph)
                 
-        if current_part:
-            parts.append(current_part)
+        if current_len:
+            parts.append(SPLIT_MARKER.join(current))
             
         # Send all parts except the last one
         for part in parts[:-1]:
@@ -59,6 +74,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Shared Ollama client for deep_think, so its connection pool is kept alive between calls
+_DEEPSEEK_CLIENT = AsyncOpenAI(api_key="local", base_url="http://localhost:11434/v1")
+
 try:
     db = BlobDatabase()
 except Exception as e:
@@ -77,23 +95,23 @@ STATUS_EMOTES = {
     'listing': '📋',
     'question': '❓'
 }
+STATUS_PREFIX = {status_type: f"{emote} " for status_type, emote in STATUS_EMOTES.items()}
 
 # Replace existing DOWNLOADS_DIR definition with:
 PERSONALBLOBAI_DIR = os.path.join(str(Path.home()), '.personalblobai')
 
+_ENSURED_DIRS = set()  # Storage dirs already created this run
+
 def get_user_storage_dir(user_id, storage_type='downloads'):
     """Get user-specific storage directory inside .personalblobai"""
+    # Storage type directory (downloads, documents, etc.) inside the user directory
+    storage_dir = os.path.join(PERSONALBLOBAI_DIR, str(user_id), storage_type)
+    if storage_dir in _ENSURED_DIRS:
+        return storage_dir
     try:
-        # Ensure base directory exists
-        os.makedirs(PERSONALBLOBAI_DIR, exist_ok=True)
-        
-        # Create user directory
-        user_dir = os.path.join(PERSONALBLOBAI_DIR, str(user_id))
-        os.makedirs(user_dir, exist_ok=True)
-        
-        # Create storage type directory (downloads, documents, etc.)
-        storage_dir = os.path.join(user_dir, storage_type)
+        # Creates the base and user directories along the way
         os.makedirs(storage_dir, exist_ok=True)
+        _ENSURED_DIRS.add(storage_dir)
         
         logger.info(f"Using {storage_type} directory for user {user_id}: {storage_dir}")
         return storage_dir
@@ -101,31 +119,124 @@ def get_user_storage_dir(user_id, storage_type='downloads'):
         logger.error(f"Error creating user storage directory: {e}")
         raise
 
+async def download_file(file, file_path):
+    """Download a Telegram file; the disk write runs in a worker thread so it doesn't block the event loop"""
+    data = await file.download_as_bytearray()
+    await asyncio.to_thread(Path(file_path).write_bytes, data)
+
+async def embed_and_summarize(content, content_type):
+    """Generate the embedding and AI summary concurrently; they only depend on the content"""
+    return await asyncio.gather(
+        asyncio.to_thread(get_embedding, content),
+        asyncio.to_thread(generate_summary, content, content_type),
+    )
+
+def with_listen_button(reply_markup):
+    """Add audio button if the first button carries an id in its callback data"""
+    if isinstance(reply_markup, InlineKeyboardMarkup) and reply_markup.inline_keyboard:
+        keyboard = reply_markup.inline_keyboard
+        callback_data = getattr(keyboard[0][0], 'callback_data', None) if keyboard[0] else None
+        if isinstance(callback_data, str) and ':' in callback_data:
+            existing_id = callback_data.split(':')[1]
+            reply_markup = InlineKeyboardMarkup(list(keyboard) + [[
+                InlineKeyboardButton("🔊 Listen", callback_data=f"audio:{existing_id}")
+            ]])
+    return reply_markup
+
+_BACKGROUND_TASKS = set()  # Keep references so pending deletes aren't garbage-collected
+
+async def _delete_message(message):
+    try:
+        await message.delete()
+    except Exception as e:
+        logger.warning(f"Error deleting status message: {e}")
+
+def delete_in_background(message):
+    """Delete a status message without waiting for Telegram to acknowledge it"""
+    if message is None:
+        return
+    task = asyncio.create_task(_delete_message(message))
+    _BACKGROUND_TASKS.add(task)
+    task.add_done_callback(_BACKGROUND_TASKS.discard)
+
 async def send_status(message, status_type, text, reply_markup=None):
     """Send or edit a status message with appropriate emote and optional keyboard"""
-    emote = STATUS_EMOTES.get(status_type, '')
     try:
-        # Add audio button if keyboard exists
-        if reply_markup and isinstance(reply_markup, InlineKeyboardMarkup):
-            keyboard = list(reply_markup.inline_keyboard)
-            if ':' in str(keyboard):
-                first_button = keyboard[0][0]
-                if hasattr(first_button, 'callback_data') and ':' in first_button.callback_data:
-                    existing_id = first_button.callback_data.split(':')[1]
-                    keyboard.append([
-                        InlineKeyboardButton("🔊 Listen", callback_data=f"audio:{existing_id}")
-                    ])
-                    reply_markup = InlineKeyboardMarkup(keyboard)
-        
         return await split_and_send_message(
             message,
-            f"{emote} {text}",
-            reply_markup=reply_markup
+            STATUS_PREFIX.get(status_type, ' ') + text,
+            reply_markup=with_listen_button(reply_markup)
         )
     except Exception as e:
         logger.error(f"Error sending status: {e}")
         return None
 
+class StatusBatcher:
+    """Show a multi-step operation's progress in one status message.
+
+    The first update is sent as a reply; later updates edit that message in
+    place. Updates arriving within flush_interval of the last edit are
+    coalesced so only the latest one is shown, and finish() turns the status
+    message into the final result when it fits in one message.
+    """
+
+    def __init__(self, message, flush_interval=0.8):
+        self.message = message
+        self.flush_interval = flush_interval
+        self.status_msg = None
+        self._pending = None
+        self._last_flush = 0.0
+        self._flush_task = None
+
+    async def update(self, status_type, text):
+        self._pending = STATUS_PREFIX.get(status_type, ' ') + text
+        if self.status_msg is None:
+            text, self._pending = self._pending, None
+            self._last_flush = time.monotonic()
+            self.status_msg = await self.message.reply_text(text)
+            return
+        delay = self._last_flush + self.flush_interval - time.monotonic()
+        if delay <= 0:
+            await self._flush()
+        elif self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later(delay))
+
+    async def _flush_later(self, delay):
+        await asyncio.sleep(delay)
+        self._flush_task = None
+        await self._flush()
+
+    async def _flush(self):
+        if self._pending is None:
+            return
+        text, self._pending = self._pending, None
+        self._last_flush = time.monotonic()
+        try:
+            await self.status_msg.edit_text(text)
+        except Exception as e:
+            logger.warning(f"Error updating status: {e}")
+
+    async def finish(self, status_type, text, reply_markup=None):
+        """Replace the progress status with the final result"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        self._pending = None
+        text = STATUS_PREFIX.get(status_type, ' ') + text
+        reply_markup = with_listen_button(reply_markup)
+        if self.status_msg is not None:
+            try:
+                if len(text) <= MAX_MESSAGE_LENGTH:
+                    return await self.status_msg.edit_text(text, reply_markup=reply_markup)
+                delete_in_background(self.status_msg)
+            except Exception as e:
+                logger.warning(f"Error finishing status: {e}")
+        try:
+            return await split_and_send_message(self.message, text, reply_markup=reply_markup)
+        except Exception as e:
+            logger.error(f"Error sending status: {e}")
+            return None
+
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(
         'Hello! I am your Personal Blob AI assistant. I can help you store and manage '
@@ -149,10 +260,11 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def ask_with_scope_buttons(msg, question: str):
     """Show buttons for MyBlob/TheBlob search scope"""
+    question_id = register_callback(question)
     keyboard = [
         [
-            InlineKeyboardButton("Search MyBlob (Private)", callback_data=f"ask_private:{question}"),
-            InlineKeyboardButton("Search TheBlob (Public)", callback_data=f"ask_public:{question}")
+            InlineKeyboardButton("Search MyBlob (Private)", callback_data=f"ask_private:{question_id}"),
+            InlineKeyboardButton("Search TheBlob (Public)", callback_data=f"ask_public:{question_id}")
         ]
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -161,15 +273,23 @@ async def ask_with_scope_buttons(msg, question: str):
         reply_markup=reply_markup
     )
 
+# Answers reused for near-identical questions, skipping the LLM call
+SEMANTIC_CACHE = SemanticCache(max_entries=512, threshold=0.92)
+# /ask answers need a stricter match: two different questions ("Alice's birthday?" vs
+# "Bob's birthday?") can retrieve the same blobs and still sit above 0.92
+ASK_CACHE = SemanticCache(max_entries=512, threshold=0.97)
+
+THINK_PATTERN = re.compile(r'<think>(.*?)</think>', re.DOTALL)
+
 async def parse_deep_thinking(response_text):
     """Parse structured deep thinking response"""
     try:
         # Extract thoughts and answer using regex
-        thoughts_match = re.search(r'<think>(.*?)</think>', response_text, re.DOTALL)
+        thoughts_match = THINK_PATTERN.search(response_text)
         thoughts = thoughts_match.group(1).strip() if thoughts_match else ""
         
-        # Get final answer (everything after </think>)
-        answer = re.split(r'</think>', response_text)[-1].strip()
+        # Get final answer (everything after the last </think>)
+        answer = response_text.rpartition('</think>')[2].strip()
         
         # Format the response nicely
         formatted_response = (
@@ -186,39 +306,48 @@ async def parse_deep_thinking(response_text):
         logger.error(f"Error parsing deep thinking response: {e}")
         return response_text  # Return original text if parsing fails
 
-async def deep_think(content, user_id):
+async def deep_think(content, user_id, content_embedding=None):
     """Perform deep thinking analysis using semantic search"""
     try:
-        # Generate embedding for content
-        content_embedding = get_embedding(content)
+        # Generate embedding for content unless the caller already has it
+        if content_embedding is None:
+            content_embedding = get_embedding(content)
         if content_embedding is None or not content_embedding.any():
             return "Unable to analyze content semantically."
-        
+
         # Search both private and public content
-        private_blobs = db.search_similar_blobs(content_embedding, user_id, limit=6, public_only=False)
-        public_blobs = db.search_similar_blobs(content_embedding, user_id, limit=6, public_only=True)
+        private_blobs, public_blobs = db.search_similar_blobs_dual(
+            content_embedding, user_id, limit_private=6, limit_public=6
+        )
+
+        # Only reuse an analysis of this exact content built from the same related blobs
+        content_hash = hashlib.blake2b(content.encode('utf-8', 'surrogatepass'), digest_size=16).hexdigest()
+        cache_namespace = ('deep_think', user_id, content_hash,
+                           tuple(blob.id for blob in private_blobs), tuple(blob.id for blob in public_blobs))
+        cached = SEMANTIC_CACHE.get(cache_namespace, content_embedding)
+        if cached is not None:
+            return cached
         
         # Format prompt with related content
         prompt_parts = ["Related information found:"]
         
         if private_blobs:
             prompt_parts.append("\nFrom private knowledge:")
-            for _, content, _, summary, _ in private_blobs:
-                if summary:
-                    prompt_parts.append(f"- {summary}")
+            for blob in private_blobs:
+                if blob.summary:
+                    prompt_parts.append(f"- {blob.summary}")
                 else:
-                    prompt_parts.append(f"- {content[:200]}...")
+                    prompt_parts.append(f"- {blob.content[:200]}...")
         
         if public_blobs:
             prompt_parts.append("\nFrom public knowledge:")
-            for _, content, _, summary, _ in public_blobs:
-                if summary:
-                    prompt_parts.append(f"- {summary}")
+            for blob in public_blobs:
+                if blob.summary:
+                    prompt_parts.append(f"- {blob.summary}")
                 else:
-                    prompt_parts.append(f"- {content[:200]}...")
+                    prompt_parts.append(f"- {blob.content[:200]}...")
         
         # Generate deep analysis with structured format
-        client = OpenAI(api_key="local", base_url="http://localhost:11434/v1")
         prompt = (
             f"Content to analyze:\n{content}\n\n"
             f"{' '.join(prompt_parts)}\n\n"
@@ -229,13 +358,15 @@ async def deep_think(content, user_id):
             "4. Critical thinking points"
         )
         
-        response = client.chat.completions.create(
+        response = await _DEEPSEEK_CLIENT.chat.completions.create(
             model="deepseek-r1:1.5b",
             messages=[{"role": "user", "content": prompt}]
         )
         
         raw_response = response.choices[0].message.content
-        return await parse_deep_thinking(raw_response)
+        analysis = await parse_deep_thinking(raw_response)
+        SEMANTIC_CACHE.put(cache_namespace, content_embedding, analysis)
+        return analysis
         
     except Exception as e:
         logger.error(f"Deep thinking error: {e}")
@@ -260,11 +391,12 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # Check if message ends with "?" for text messages
         if msg.text and msg.text.strip().endswith('?'):
             logger.info("Question detected, showing options")
+            question_id = register_callback(msg.text)
             keyboard = [
                 [
-                    InlineKeyboardButton("Store this question", callback_data=f"store:{msg.text}"),
-                    InlineKeyboardButton("Search MyBlob", callback_data=f"ask_private:{msg.text}"),
-                    InlineKeyboardButton("Search TheBlob", callback_data=f"ask_public:{msg.text}")
+                    InlineKeyboardButton("Store this question", callback_data=f"store:{question_id}"),
+                    InlineKeyboardButton("Search MyBlob", callback_data=f"ask_private:{question_id}"),
+                    InlineKeyboardButton("Search TheBlob", callback_data=f"ask_public:{question_id}")
                 ]
             ]
             reply_markup = InlineKeyboardMarkup(keyboard)
@@ -274,7 +406,8 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             return
 
-        status_msg = await send_status(msg, 'processing', "Processing your message...")
+        status = StatusBatcher(msg)
+        await status.update('processing', "Processing your message...")
         
         try:
             # Handle different types of content
@@ -291,17 +424,15 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 logger.info(f"Downloading photo to {file_path}")
                 
                 try:
-                    # Ensure the directory exists
-                    os.makedirs(os.path.dirname(file_path), exist_ok=True)
-                    await file.download_to_drive(file_path)
+                    await download_file(file, file_path)
                     logger.info(f"Photo downloaded successfully to {file_path}")
                 except Exception as download_error:
                     logger.error(f"Error downloading photo: {download_error}")
                     raise
                 
                 # Analyze image with vision agent
-                await send_status(msg, 'thinking', "Analyzing image...")
-                vision_analysis = analyze_image(file_path)
+                await status.update('thinking', "Analyzing image...")
+                vision_analysis = await analyze_image_async(file_path)
                 content = f"Image Analysis:\n{vision_analysis}\n"
                 if msg.caption:
                     content += f"\nCaption: {msg.caption}"
@@ -315,8 +446,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 logger.info(f"Downloading document to {file_path}")
                 
                 try:
-                    os.makedirs(os.path.dirname(file_path), exist_ok=True)
-                    await file.download_to_drive(file_path)
+                    await download_file(file, file_path)
                     logger.info(f"Document downloaded successfully to {file_path}")
                 except Exception as download_error:
                     logger.error(f"Error downloading document: {download_error}")
@@ -326,19 +456,13 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 await msg.reply_text("Sorry, this type of content is not supported yet.")
                 return
 
-            # Generate embedding for the content
-            embedding = get_embedding(content)
+            await status.update('thinking', "Generating AI summary...")
+            embedding, summary = await embed_and_summarize(content, content_type)
 
-            await send_status(msg, 'storing', "Storing in MyBlob...")
-            # Store in MyBlob with embedding
+            await status.update('storing', "Storing in MyBlob...")
+            # Store in MyBlob with embedding and AI summary
             logger.info(f"Storing {content_type} content for user {user.id}")
-            blob_id = db.store_blob(user.id, content_type, content, file_path, embedding=embedding)
-            
-            await send_status(msg, 'thinking', "Generating AI summary...")
-            # Generate and store AI summary
-            logger.info(f"Generating AI summary for blob {blob_id}")
-            summary = generate_summary(content, content_type)
-            db.update_summary(blob_id, summary)
+            blob_id = db.store_blob(user.id, content_type, content, file_path, embedding=embedding, summary=summary)
             
             keyboard = [
                 [
@@ -347,7 +471,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 ]
             ]
             reply_markup = InlineKeyboardMarkup(keyboard)
-            await send_status(msg, 'success', 
+            await status.finish('success', 
                 f"Content stored in MyBlob with ID {blob_id}!\n"
                 f"Here's the AI summary:\n{summary}\n\n"
                 f"Would you like to share this blob or perform deep analysis?",
@@ -355,23 +479,69 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             logger.info(f"Successfully processed and stored blob {blob_id}")
         except Exception as e:
-            await status_msg.delete() if status_msg else None
-            await send_status(msg, 'error', f"An error occurred: {e}")
+            await status.finish('error', f"An error occurred: {e}")
     except Exception as e:
         logger.error(f"Error handling message: {e}")
         await send_status(msg, 'error', f"An error occurred: {e}")
 
+class TTLCache(OrderedDict):
+    """Dict that forgets entries after `ttl` seconds and evicts the oldest beyond `maxsize`"""
+
+    def __init__(self, maxsize, ttl):
+        super().__init__()
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, (time.monotonic() + self.ttl, value))
+        self.move_to_end(key)
+        while len(self) > self.maxsize:
+            self.popitem(last=False)
+
+    def __getitem__(self, key):
+        expires, value = super().__getitem__(key)
+        if expires < time.monotonic():
+            del self[key]
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
 # Add this near the top with other global variables
-TEMP_ANALYSES = {}  # Store temporary analyses with unique IDs
+TEMP_ANALYSES = TTLCache(maxsize=1024, ttl=3600)  # Store temporary analyses with unique IDs
+
+# Free-form text (questions) behind inline buttons; Telegram caps callback_data at 64 bytes,
+# so buttons carry a registry id instead of the text. Ids start at the current time in ms so
+# buttons left over from a previous run don't resolve to new payloads.
+CALLBACK_REGISTRY = TTLCache(maxsize=4096, ttl=86400)
+_callback_ids = itertools.count(int(time.time() * 1000))
+
+def register_callback(payload):
+    """Store a button payload and return the id to put in its callback_data"""
+    callback_id = next(_callback_ids)
+    CALLBACK_REGISTRY[callback_id] = payload
+    return callback_id
 audio_gen = AudioGenerator()
 
 async def send_audio_files(msg, audio_files):
     """Send multiple audio files as voice messages"""
+    # Sent one at a time: the chunks are consecutive parts of the same text
     for file_path in audio_files:
         try:
-            with open(file_path, 'rb') as audio:
-                await msg.reply_voice(audio)
-            os.remove(file_path)  # Clean up after sending
+            # Keep the file: AudioGenerator reuses it when the same text is requested again
+            audio = await asyncio.to_thread(Path(file_path).read_bytes)
+            await msg.reply_voice(audio, filename=os.path.basename(file_path))
         except Exception as e:
             logger.error(f"Error sending audio: {e}")
 
@@ -401,11 +571,11 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
                         
                     # Use the AI summary if this was a summary message
                     if "Here's the AI summary" in query.message.text:
-                        content = blob[7]  # Get summary from blob
+                        content = blob.ai_summary
                         if not content:
                             content = "Summary not available."
                     else:
-                        content = blob[3]  # Get original content
+                        content = blob.content
                 except ValueError:
                     await query.message.reply_text("Invalid content ID")
                     return
@@ -416,7 +586,7 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             audio_files = audio_gen.generate_audio(content, query.from_user.id)
             if audio_files:
                 await send_audio_files(query.message, audio_files)
-                await status_msg.delete()
+                delete_in_background(status_msg)
             else:
                 await status_msg.edit_text("❌ Failed to generate audio")
         elif action == "think":
@@ -430,7 +600,8 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             thinking_msg = await send_status(query.message, 'thinking', 
                 "Performing deep analysis considering related information...")
             
-            analysis = await deep_think(blob[3], query.from_user.id)
+            # Reuse the stored embedding rather than embedding the content again
+            analysis = await deep_think(blob.content, query.from_user.id, db.get_blob_embedding(blob_id))
             
             # Generate unique ID for this analysis
             analysis_id = f"a{datetime.now().strftime('%Y%m%d%H%M%S')}-{query.from_user.id}"
@@ -444,7 +615,7 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             ]
             reply_markup = InlineKeyboardMarkup(keyboard)
             
-            await thinking_msg.delete() if thinking_msg else None
+            delete_in_background(thinking_msg)
             await send_status(query.message, 'success', analysis, reply_markup=reply_markup)
             
         elif action == "summarize":
@@ -460,21 +631,18 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             status_msg = await send_status(query.message, 'processing', "Storing analysis as new blob...")
             
             try:
-                # Generate embedding for the analysis
-                embedding = get_embedding(thinking_content)
+                # Generate embedding and summary for the analysis
+                embedding, summary = await embed_and_summarize(thinking_content, 'analysis')
                 
                 # Store as new blob
                 blob_id = db.store_blob(
                     query.from_user.id, 
                     'analysis', 
                     thinking_content, 
-                    embedding=embedding
+                    embedding=embedding,
+                    summary=summary
                 )
                 
-                # Generate summary
-                summary = generate_summary(thinking_content, 'analysis')
-                db.update_summary(blob_id, summary)
-                
                 # Add share button to the new blob
                 keyboard = [
                     [
@@ -483,7 +651,7 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 ]
                 reply_markup = InlineKeyboardMarkup(keyboard)
                 
-                await status_msg.delete() if status_msg else None
+                delete_in_background(status_msg)
                 await send_status(
                     query.message, 
                     'success',
@@ -494,7 +662,7 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 )
                 
             except Exception as e:
-                await status_msg.delete() if status_msg else None
+                delete_in_background(status_msg)
                 await send_status(query.message, 'error', f"Error storing analysis: {e}")
         elif action == "share":
             # Handle share button press
@@ -512,11 +680,15 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             except Exception as e:
                 await query.message.reply_text(f"An error occurred while sharing: {e}")
         elif action in ["ask_private", "ask_public"]:
-            # Handle scoped queries
+            # Handle scoped queries; kept in the registry so the other scope can be tried too
+            question = CALLBACK_REGISTRY.get(int(data)) if data.isdigit() else None
+            if question is None:
+                await query.message.reply_text("This question has expired. Please ask again.")
+                return
             await handle_scoped_query(
                 query.message, 
                 query.from_user.id, 
-                data, 
+                question, 
                 scope='public' if action == "ask_public" else 'private'
             )
             
@@ -558,27 +730,36 @@ async def unshare_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     except Exception as e:
         await msg.reply_text(f"An error occurred: {e}")
 
+LIST_PAGE_SIZE = 20
+
 async def list_blobs(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.message.from_user.id
-    blobs = db.get_user_blobs(user_id)
+    page = int(context.args[0]) if context.args and context.args[0].isdigit() else 1
+    page = max(page, 1)
+    blobs = db.get_user_blobs(user_id, limit=LIST_PAGE_SIZE, offset=(page - 1) * LIST_PAGE_SIZE)
     
     if not blobs:
-        await update.message.reply_text("You don't have any stored blobs yet!")
+        if page > 1:
+            await update.message.reply_text(f"No blobs on page {page}.")
+        else:
+            await update.message.reply_text("You don't have any stored blobs yet!")
         return
         
-    response = "Your stored blobs:\n\n"
+    response = f"Your stored blobs (page {page}):\n\n"
     for blob in blobs:
-        username = blob[8] or "Unknown"  # Get username from joined query
-        ownership = "Your blob" if blob[1] == user_id else f"Public blob by {username}"
+        username = blob.username or "Unknown"
+        ownership = "Your blob" if blob.user_id == user_id else f"Public blob by {username}"
         response += (
-            f"ID: {blob[0]}\n"
-            f"Type: {blob[2]}\n"
-            f"Summary: {blob[7]}\n"
+            f"ID: {blob.id}\n"
+            f"Type: {blob.content_type}\n"
+            f"Summary: {blob.ai_summary}\n"
             f"Status: {ownership}\n"
-            f"{'Public' if blob[5] else 'Private'}\n\n"
+            f"{'Public' if blob.is_public else 'Private'}\n\n"
         )
+    if len(blobs) == LIST_PAGE_SIZE:
+        response += f"Use /list {page + 1} to see more."
     
-    await update.message.reply_text(response)
+    await split_and_send_message(update.message, response)
 
 async def ask_command(update: Update, context: ContextTypes.DEFAULT_TYPE, *, from_callback=False):
     if not update or not update.message:
@@ -609,43 +790,51 @@ async def ask_command(update: Update, context: ContextTypes.DEFAULT_TYPE, *, fro
 
 async def handle_scoped_query(msg, user_id, question, scope):
     """Handle query with specific scope (private/public)"""
-    status_msg = await send_status(msg, 'thinking', "Processing your question...")
+    status = StatusBatcher(msg)
+    await status.update('thinking', "Processing your question...")
     
     try:
         logger.info(f"Processing {scope} ask command for user {user_id}")
         query_embedding = get_embedding(question)
         
         if query_embedding is None:
-            await status_msg.delete() if status_msg else None
-            await send_status(msg, 'error', "Sorry, I couldn't process your question.")
+            await status.finish('error', "Sorry, I couldn't process your question.")
             return
-            
+
         # Search with appropriate scope
         if scope == 'private':
-            await send_status(msg, 'searching', "Searching through your private content...")
+            await status.update('searching', "Searching through your private content...")
             similar_blobs = db.search_similar_blobs(query_embedding, user_id, public_only=False)
             search_context = "MyBlob"
         else:
-            await send_status(msg, 'searching', "Searching through public content...")
+            await status.update('searching', "Searching through public content...")
             similar_blobs = db.search_similar_blobs(query_embedding, user_id, public_only=True)
             search_context = "TheBlob"
             
         logger.info(f"Found {len(similar_blobs)} similar blobs in {search_context}")
         
         if not similar_blobs:
-            await status_msg.delete() if status_msg else None
-            await send_status(msg, 'error', f"I couldn't find any relevant information in {search_context}.")
+            await status.finish('error', f"I couldn't find any relevant information in {search_context}.")
+            return
+
+        # A cached answer is only reused when it was generated from the same blobs, so new
+        # or changed content is picked up. Public answers are shared between users.
+        context_ids = tuple(blob.id for blob in similar_blobs)
+        cache_namespace = ('ask', user_id if scope == 'private' else 'public', context_ids)
+        answer = ASK_CACHE.get(cache_namespace, query_embedding)
+        if answer is not None:
+            await status.finish('success', f"Q: {question}\n\nA: {answer}")
             return
             
-        await send_status(msg, 'processing', "Generating answer...")
+        await status.update('processing', "Generating answer...")
         answer = query_database(question, similar_blobs, user_id)
-        await status_msg.delete() if status_msg else None
-        await send_status(msg, 'success', f"Q: {question}\n\nA: {answer}")
+        if not answer.startswith("Sorry, I couldn't"):
+            ASK_CACHE.put(cache_namespace, query_embedding, answer)
+        await status.finish('success', f"Q: {question}\n\nA: {answer}")
             
     except Exception as e:
         logger.error(f"Error in handle_scoped_query: {e}", exc_info=True)
-        await status_msg.delete() if status_msg else None
-        await send_status(msg, 'error', f"An error occurred: {e}")
+        await status.finish('error', f"An error occurred: {e}")
 
 async def store_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     msg = update.message
@@ -662,16 +851,11 @@ async def store_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     status_msg = await send_status(msg, 'storing', "Storing your content...")
     try:
-        # Generate embedding for the content
-        embedding = get_embedding(content)
+        # Generate embedding and AI summary for the content
+        embedding, summary = await embed_and_summarize(content, 'text')
 
-        # Store in MyBlob with embedding
-        blob_id = db.store_blob(user_id, 'text', content, embedding=embedding)
-        
-        # Generate and store AI summary
-        logger.info(f"Generating AI summary for blob {blob_id}")
-        summary = generate_summary(content, 'text')
-        db.update_summary(blob_id, summary)
+        # Store in MyBlob with embedding and summary
+        blob_id = db.store_blob(user_id, 'text', content, embedding=embedding, summary=summary)
         
         keyboard = [
             [
@@ -687,7 +871,7 @@ async def store_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         logger.info(f"Successfully processed and stored blob {blob_id}")
     except Exception as e:
-        await status_msg.delete() if status_msg else None
+        delete_in_background(status_msg)
         await send_status(msg, 'error', f"An error occurred: {e}")
 
 async def reprocess_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -700,7 +884,7 @@ async def reprocess_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     try:
         await msg.reply_text("Starting embedding reprocessing...")
-        processed = db.reprocess_embeddings(get_embedding)
+        processed = db.reprocess_embeddings(get_embedding, batch_embed_func=get_embeddings)
         await msg.reply_text(f"Reprocessing complete. Updated {processed} blobs with new embeddings.")
     except Exception as e:
         logger.error(f"Error during reprocessing: {e}")
@@ -4,13 +4,26 @@ import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# Shared Ollama client: its connection pool keeps connections alive between calls
+_CLIENT = OpenAI(api_key="local", base_url="http://localhost:11434/v1")
+
+# Instructions go in a byte-identical system message ahead of the per-call context,
+# so Ollama can reuse the cached prefix instead of re-evaluating it every request
+QUERY_DATABASE_PROMPT = (
+    "You answer questions using context retrieved from the user's database. "
+    "Please provide a relevant answer based on the context in the message."
+)
+QUERY_BLOB_PROMPT = (
+    "You answer questions about a single piece of content. "
+    "Please provide a relevant answer based on the content in the message."
+)
+
 def get_embedding(text):
     try:
         if not text:
             return None
             
-        client = OpenAI(api_key="local", base_url="http://localhost:11434/v1")
-        response = client.embeddings.create(
+        response = _CLIENT.embeddings.create(
             model="nomic-embed-text",  # Use this specific model for embeddings
             input=text
         )
@@ -29,10 +42,30 @@ def get_embedding(text):
         print(f"Embedding generation error: {e}")
         return None
 
-def query_database(question, similar_blobs, user_id):
+def get_embeddings(texts):
+    """Embed several texts in a single request; failed entries come back as None"""
+    embeddings = [None] * len(texts)
     try:
-        client = OpenAI(api_key="local", base_url="http://localhost:11434/v1")
+        # Empty strings get no embedding, same as get_embedding
+        indices = [i for i, text in enumerate(texts) if text]
+        if not indices:
+            return embeddings
+            
+        response = _CLIENT.embeddings.create(
+            model="nomic-embed-text",
+            input=[texts[i] for i in indices]
+        )
         
+        for item in response.data:
+            if item.embedding:
+                embeddings[indices[item.index]] = np.array(item.embedding, dtype=np.float32)
+        return embeddings
+    except Exception as e:
+        print(f"Batch embedding generation error: {e}")
+        return embeddings
+
+def query_database(question, similar_blobs, user_id):
+    try:
         if not similar_blobs:
             logger.warning("No similar blobs provided")
             return "I couldn't find any relevant information to answer your question."
@@ -55,13 +88,15 @@ def query_database(question, similar_blobs, user_id):
         
         prompt = (
             f"Context from database:\n{context}\n\n"
-            f"Question: {question}\n"
-            "Please provide a relevant answer based on the context above."
+            f"Question: {question}"
         )
         
-        response = client.chat.completions.create(
+        response = _CLIENT.chat.completions.create(
             model="llama3.2:3b",
-            messages=[{"role": "user", "content": prompt}]
+            messages=[
+                {"role": "system", "content": QUERY_DATABASE_PROMPT},
+                {"role": "user", "content": prompt}
+            ]
         )
         
         if not response.choices:
@@ -77,18 +112,19 @@ def query_database(question, similar_blobs, user_id):
 # Keep the original function for single blob queries
 def query_blob(blob_content, blob_type, question):
     try:
-        client = OpenAI(api_key="local", base_url="http://localhost:11434/v1")
-        
         prompt = (
             f"Context: This is a {blob_type} content:\n"
             f"{blob_content}\n\n"
-            f"Question: {question}\n"
-            "Please provide a relevant answer based on the content above."
+            f"Question: {question}"
         )
         
-        response = client.chat.completions.create(
+        response = _CLIENT.chat.completions.create(
             model="llama3.2:3b",
             messages=[
+                {
+                    "role": "system",
+                    "content": QUERY_BLOB_PROMPT
+                },
                 {
                     "role": "user",
                     "content": prompt
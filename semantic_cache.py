@@ -0,0 +1,69 @@
+import time
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class SemanticCache:
+    """Bounded LRU of LLM responses, looked up by embedding similarity.
+
+    Embeddings are kept unit-normalized in one preallocated (max_entries, D)
+    float32 matrix, so a lookup is a single matmul. Each entry belongs to a
+    namespace (e.g. the user and search scope) and is only returned for lookups
+    in the same namespace; entries older than ttl seconds are ignored so answers
+    catch up with newly stored blobs.
+    """
+
+    def __init__(self, max_entries=512, threshold=0.92, ttl=3600):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl = ttl
+        self._clear(None)
+
+    def _clear(self, dim):
+        self.dim = dim
+        self._size = 0
+        self._matrix = np.zeros((self.max_entries, dim), dtype=np.float32) if dim else None
+        self._namespaces = [None] * self.max_entries
+        self._responses = [None] * self.max_entries
+        self._created = np.zeros(self.max_entries)
+        self._last_used = np.zeros(self.max_entries)
+
+    def get(self, namespace, embedding):
+        """Return the cached response for a near-identical embedding, or None"""
+        if embedding is None or self._size == 0 or embedding.size != self.dim:
+            return None
+        now = time.monotonic()
+        n = self._size
+        sims = self._matrix[:n] @ self._normalize(embedding)
+        valid = np.array([ns == namespace for ns in self._namespaces[:n]]) & (now - self._created[:n] < self.ttl)
+        sims[~valid] = -np.inf
+        best = int(np.argmax(sims))
+        if sims[best] < self.threshold:
+            return None
+        self._last_used[best] = now
+        logger.info(f"Semantic cache hit for {namespace} (similarity {sims[best]:.3f})")
+        return self._responses[best]
+
+    def put(self, namespace, embedding, response):
+        if embedding is None or not embedding.size:
+            return
+        if embedding.size != self.dim:
+            # Embedding model changed; old entries can't be compared any more
+            self._clear(embedding.size)
+        if self._size < self.max_entries:
+            slot = self._size
+            self._size += 1
+        else:
+            slot = int(np.argmin(self._last_used))
+        now = time.monotonic()
+        self._matrix[slot] = self._normalize(embedding)
+        self._namespaces[slot] = namespace
+        self._responses[slot] = response
+        self._created[slot] = now
+        self._last_used[slot] = now
+
+    @staticmethod
+    def _normalize(embedding):
+        embedding = np.asarray(embedding, dtype=np.float32)
+        return embedding / (np.sqrt(embedding @ embedding) + 1e-9)
@@ -1,12 +1,41 @@
+import hashlib
+import threading
+from collections import OrderedDict
 from openai import OpenAI
 
+# Shared Ollama client: its connection pool keeps connections alive between calls
+_CLIENT = OpenAI(api_key="local", base_url="http://localhost:11434/v1")
+
+SUMMARY_CACHE_SIZE = 1024
+_summary_cache = OrderedDict()  # blake2b(content_type, content) -> summary, least recently used first
+_summary_cache_lock = threading.Lock()  # generate_summary is also called from worker threads
+
+def _summary_key(content, content_type):
+    digest = hashlib.blake2b(content.encode('utf-8', 'surrogatepass'), digest_size=16)
+    digest.update(content_type.encode())
+    return digest.hexdigest()
+
 def generate_summary(content, content_type):
+    """Summarize content, reusing the last summary of identical content"""
+    key = _summary_key(content, content_type)
+    with _summary_cache_lock:
+        if key in _summary_cache:
+            _summary_cache.move_to_end(key)
+            return _summary_cache[key]
+
+    summary = _generate_summary(content, content_type)
+    if summary != "Failed to generate summary":
+        with _summary_cache_lock:
+            _summary_cache[key] = summary
+            if len(_summary_cache) > SUMMARY_CACHE_SIZE:
+                _summary_cache.popitem(last=False)
+    return summary
+
+def _generate_summary(content, content_type):
     try:
-        client = OpenAI(api_key="local", base_url="http://localhost:11434/v1")
-        
         prompt = f"Please provide a brief summary of this {content_type}: {content}"
         
-        response = client.chat.completions.create(
+        response = _CLIENT.chat.completions.create(
             model="llama3.2:3b",
             messages=[
                 {
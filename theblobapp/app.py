@@ -4,8 +4,7 @@ from database import BlobDatabase
 import database_extension
 from database_copier import DatabaseCopier
 import atexit
-from datetime import datetime, timedelta
-from collections import defaultdict
+from itertools import groupby
 import logging
 
 # Configure logging
@@ -24,7 +23,7 @@ db = BlobDatabase()
 db.create_tables()
 
 # Initialize database copier with shorter interval
-db_copier = DatabaseCopier(db.db_path, update_interval=30)
+db_copier = DatabaseCopier(db.db_path, update_interval=30, on_copy=db.clear_public_embeddings)
 db_copier.start()
 db.set_copy_path(db_copier.get_copy_path())
 
@@ -35,9 +34,17 @@ def cleanup():
 @app.route('/')
 def index():
     page = request.args.get('page', 1, type=int)
-    public_blobs = db.get_public_blobs(page=page)
+    public_blobs = db.get_public_blobs(
+        page=page,
+        after_ts=request.args.get('after_ts'),
+        after_id=request.args.get('after_id', type=int),
+    )
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        return jsonify(blobs=public_blobs)
+        # The last blob is the cursor for the next request's after_ts/after_id
+        next_cursor = None
+        if public_blobs:
+            next_cursor = {'after_ts': public_blobs[-1]['timestamp'], 'after_id': public_blobs[-1]['id']}
+        return jsonify(blobs=public_blobs, next_cursor=next_cursor)
     return render_template('index.html', blobs=public_blobs)
 
 @app.route('/search')
@@ -68,11 +75,9 @@ def view_blob(blob_id):
 def timeline():
     days = request.args.get('days', 7, type=int)
     blobs = db.get_public_blobs_by_date(days=days)
-    grouped_blobs = defaultdict(list)
-    for blob in blobs:
-        date = datetime.strptime(blob['timestamp'], '%Y-%m-%d %H:%M:%S').strftime('%Y-%m-%d')
-        grouped_blobs[date].append(blob)
-    return render_template('timeline.html', grouped_blobs=dict(grouped_blobs))
+    # Rows arrive newest first, so each day is one contiguous run
+    grouped_blobs = {day: list(day_blobs) for day, day_blobs in groupby(blobs, key=lambda blob: blob['day'])}
+    return render_template('timeline.html', grouped_blobs=grouped_blobs)
 
 @socketio.on('connect')
 def handle_connect():
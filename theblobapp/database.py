@@ -1,14 +1,106 @@
 import sqlite3
 from datetime import datetime
 import os
+import queue
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 import logging
 import numpy as np
-from numpy.linalg import norm
+
+try:
+    import simsimd
+except ImportError:  # Optional: score with NumPy matmuls
+    simsimd = None
+
+try:
+    from numba import njit, prange
+except ImportError:  # Optional: int8 rows are converted to float32 for the matmul
+    njit = None
+
+try:
+    import sqlite_vec
+except ImportError:  # Optional: similar blobs are ranked in NumPy instead of vec_blobs
+    sqlite_vec = None
 
 logger = logging.getLogger(__name__)
 
+if njit is not None:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _int8_dots(codes, query, out):
+        """Dot each int8 row with the float32 query without a float32 copy of the matrix"""
+        for i in prange(codes.shape[0]):
+            s = 0.0
+            for j in range(codes.shape[1]):
+                s += codes[i, j] * query[j]
+            out[i] = s
+else:
+    _int8_dots = None
+
+def _quantize_embedding(embedding):
+    """Quantize an embedding to int8, returning (bytes, per-vector scale, norm of the quantized vector)"""
+    embedding = np.asarray(embedding, dtype=np.float32)
+    scale = float(np.max(np.abs(embedding))) / 127 or 1.0
+    codes = np.round(embedding / scale).astype(np.int8)
+    values = codes.astype(np.float32)
+    # sqrt(dot) skips np.linalg.norm's argument dispatch, which dominates for one small vector
+    return codes.tobytes(), scale, float(np.sqrt(values @ values)) * scale
+
+def _decode_embedding(data, scale):
+    """Decode a stored embedding; rows without a scale are legacy float32"""
+    if scale is None:
+        return np.frombuffer(data, dtype=np.float32)
+    return np.frombuffer(data, dtype=np.int8).astype(np.float32) * scale
+
+def _stack_embeddings(rows, dim):
+    """Stack (embedding, embedding_scale, embedding_norm) rows into one int8 matrix.
+
+    Returns (indices of the rows kept, (N, dim) int8 codes, scales, norms); rows of
+    another size are skipped. Legacy float32 rows are quantized here the same way
+    reprocess_embeddings will store them.
+    """
+    kept, blobs, scales, norms = [], [], [], []
+    for i, (data, scale, embedding_norm) in enumerate(rows):
+        if scale is None:
+            if len(data) != dim * 4:
+                continue
+            data, scale, embedding_norm = _quantize_embedding(np.frombuffer(data, dtype=np.float32))
+        elif len(data) != dim:
+            continue
+        kept.append(i)
+        blobs.append(data)
+        scales.append(scale)
+        norms.append(embedding_norm)
+    # One frombuffer over the joined BLOBs instead of one array per row
+    codes = np.frombuffer(b''.join(blobs), dtype=np.int8).reshape(-1, dim)
+    return (np.array(kept, dtype=np.int64), codes,
+            np.array(scales, dtype=np.float32), np.array(norms, dtype=np.float32))
+
+def _simsimd_cosine(query, matrix):
+    """Cosine similarity of query to each row of a same-dtype matrix via SimSIMD"""
+    distances = simsimd.cdist(query.reshape(1, -1), matrix, metric='cosine')
+    return 1 - np.asarray(distances, dtype=np.float32)[0]
+
+def _int8_cosine(codes, scales, norms, query):
+    """Cosine similarity of query to int8 code rows.
+
+    SimSIMD compares the codes directly when installed; otherwise the dots (Numba or
+    NumPy) are rescaled by the scales and norms stored at write time.
+    """
+    query = np.asarray(query, dtype=np.float32)
+    if simsimd is not None and len(codes):
+        # Native i8 cosine on the codes against the query quantized the same way
+        return _simsimd_cosine(np.frombuffer(_quantize_embedding(query)[0], dtype=np.int8), codes)
+    if _int8_dots is not None:
+        dots = np.empty(len(codes), dtype=np.float32)
+        _int8_dots(codes, query, dots)
+    else:
+        dots = codes.astype(np.float32) @ query
+    return dots * scales / (np.sqrt(query @ query) * norms + 1e-9)
+
 class BlobDatabase:
+    _POOL_SIZE = 4  # Idle connections kept per database file
+
     def __init__(self):
         # Use user's home directory for data storage
         self.data_dir = os.path.join(str(Path.home()), '.personalblobai')
@@ -17,21 +109,81 @@ class BlobDatabase:
         
         # Set up database path
         self.db_path = os.path.join(self.data_dir, 'blob_data.db')
-        # Remove the connection initialization from __init__
+        # Connections are reused across requests instead of opened per call
+        self._pool = queue.LifoQueue(self._POOL_SIZE)
+        with self.get_connection() as conn:
+            # WAL is persistent in the file: readers stop blocking behind the bot's writes
+            conn.execute('PRAGMA journal_mode = WAL')
+        # (dim, fingerprint, (ids, int8 codes, scales, norms)) of public embeddings, built
+        # by get_similar_blobs, plus an optional HNSW graph over them
+        self._public_embeddings = None
+        self._public_embeddings_stale = False
+        self._public_ann = None
+        self._public_embeddings_lock = threading.Lock()
+
+    @staticmethod
+    def _connect(path, read_only=False):
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.execute('PRAGMA synchronous = NORMAL')
+        conn.execute('PRAGMA temp_store = MEMORY')
+        if read_only:
+            # The copy is only scanned: map up to 1 GiB of it so embedding BLOBs skip read() copies
+            conn.execute('PRAGMA query_only = 1')
+            # Rows come back as sqlite3.Row, which converts to a dict in C (see rows_to_dicts)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA cache_size = -131072')
+            conn.execute('PRAGMA mmap_size = 1073741824')
+        else:
+            conn.execute('PRAGMA cache_size = -65536')
+            conn.execute('PRAGMA mmap_size = 268435456')
+        if sqlite_vec is not None:
+            # Lets queries use the bot's vec_blobs KNN index, which the copy carries along
+            try:
+                conn.enable_load_extension(True)
+                sqlite_vec.load(conn)
+                conn.enable_load_extension(False)
+            except (sqlite3.Error, AttributeError) as e:
+                logger.debug(f"Could not load sqlite-vec: {e}")
+        return conn
+
+    @contextmanager
+    def _pooled_connection(self, pool, path, read_only=False):
+        """Borrow a connection from pool; commits or rolls back like `with sqlite3.connect(...)`"""
+        try:
+            conn = pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect(path, read_only)
+        try:
+            with conn:
+                yield conn
+        finally:
+            try:
+                pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
 
     def get_connection(self):
         """Get a thread-safe database connection"""
-        return sqlite3.connect(self.db_path)
+        return self._pooled_connection(self._pool, self.db_path)
 
     def get_read_connection(self):
         """Get a connection to the read-only copy of the database"""
         if hasattr(self, 'copy_path'):
-            return sqlite3.connect(self.copy_path)
+            return self._pooled_connection(self._read_pool, self.copy_path, read_only=True)
         return self.get_connection()
         
     def set_copy_path(self, path):
         """Set the path to the database copy"""
         self.copy_path = path
+        self._read_pool = queue.LifoQueue(self._POOL_SIZE)
+
+    def clear_public_embeddings(self):
+        """Mark the cached public embeddings stale after blobs may have changed.
+
+        The next lookup compares a cheap fingerprint of the public rows and only
+        reloads (and re-indexes) them when it differs.
+        """
+        self._public_embeddings_stale = True
 
     def __del__(self):
         # Remove the connection closing since we're not storing it anymore
@@ -63,6 +215,8 @@ class BlobDatabase:
                 timestamp DATETIME,
                 ai_summary TEXT,
                 embedding BLOB,
+                embedding_norm REAL,
+                embedding_scale REAL,
                 FOREIGN KEY (user_id) REFERENCES users(user_id)
             )''')
             
@@ -77,9 +231,53 @@ class BlobDatabase:
                 FOREIGN KEY (user_id) REFERENCES users(user_id),
                 UNIQUE(blob_id, user_id)
             )''')
+
+            # Same partial index the bot creates; public listings and the timeline scan it by date
+            cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_blobs_public_ts ON blobs(is_public, timestamp DESC)
+            WHERE is_public = 1
+            ''')
+
+            self._create_search_index(cursor)
             
             conn.commit()
 
+    def _create_search_index(self, cursor):
+        """Full-text index over blob content and summaries for search_blobs.
+
+        Triggers keep it in step with every write to blobs, including the bot's, and
+        the database copy carries it along to the web app's read connections.
+        """
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'blobs_fts'")
+        exists = cursor.fetchone() is not None
+        try:
+            cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS blobs_fts USING fts5(
+                content, ai_summary,
+                content='blobs', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )''')
+            cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS blobs_fts_insert AFTER INSERT ON blobs BEGIN
+                INSERT INTO blobs_fts(rowid, content, ai_summary) VALUES (new.id, new.content, new.ai_summary);
+            END''')
+            cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS blobs_fts_delete AFTER DELETE ON blobs BEGIN
+                INSERT INTO blobs_fts(blobs_fts, rowid, content, ai_summary)
+                VALUES ('delete', old.id, old.content, old.ai_summary);
+            END''')
+            cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS blobs_fts_update AFTER UPDATE OF content, ai_summary ON blobs BEGIN
+                INSERT INTO blobs_fts(blobs_fts, rowid, content, ai_summary)
+                VALUES ('delete', old.id, old.content, old.ai_summary);
+                INSERT INTO blobs_fts(rowid, content, ai_summary) VALUES (new.id, new.content, new.ai_summary);
+            END''')
+            if not exists:
+                logger.info("Building full-text search index")
+                cursor.execute("INSERT INTO blobs_fts(blobs_fts) VALUES ('rebuild')")
+        except sqlite3.Error as e:
+            logger.warning(f"Full-text search unavailable, search falls back to LIKE: {e}")
+
     # Add method to verify tables exist
     def verify_tables(self):
         """Verify all required tables exist"""
@@ -127,20 +325,25 @@ class BlobDatabase:
         logger.info(f"Storing new blob for user {user_id} of type {content_type}")
         try:
             if embedding is not None:
-                embedding_bytes = embedding.tobytes()
+                embedding_bytes, embedding_scale, embedding_norm = _quantize_embedding(embedding)
                 logger.debug(f"Embedding size: {len(embedding_bytes)} bytes")
             else:
                 embedding_bytes = None
+                embedding_scale = None
+                embedding_norm = None
                 logger.warning("No embedding provided for content")
                 
             with self.get_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
-                INSERT INTO blobs (user_id, content_type, content, file_path, is_public, timestamp, embedding)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', (user_id, content_type, content, file_path, is_public, datetime.now(), embedding_bytes))
+                INSERT INTO blobs (user_id, content_type, content, file_path, is_public, timestamp,
+                                   embedding, embedding_norm, embedding_scale)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (user_id, content_type, content, file_path, is_public, datetime.now(),
+                      embedding_bytes, embedding_norm, embedding_scale))
                 blob_id = cursor.lastrowid
                 conn.commit()
+                self.clear_public_embeddings()
                 logger.info(f"Successfully stored blob with ID {blob_id}")
                 return blob_id
         except Exception as e:
@@ -199,15 +402,18 @@ class BlobDatabase:
                 raise ValueError("Blob not found or you don't have permission to modify it")
             
             conn.commit()
+            self.clear_public_embeddings()
             logger.info(f"Successfully updated blob {blob_id} publicity")
             return True
 
     def update_embedding(self, blob_id, embedding):
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('UPDATE blobs SET embedding = ? WHERE id = ?', 
-                          (embedding.tobytes(), blob_id))
+            embedding_bytes, embedding_scale, embedding_norm = _quantize_embedding(embedding)
+            cursor.execute('UPDATE blobs SET embedding = ?, embedding_scale = ?, embedding_norm = ? WHERE id = ?', 
+                          (embedding_bytes, embedding_scale, embedding_norm, blob_id))
             conn.commit()
+        self.clear_public_embeddings()
 
     def search_similar_blobs(self, query_embedding, user_id, limit=5):
         if query_embedding is None:
@@ -216,54 +422,43 @@ class BlobDatabase:
             
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            # Modified query to clearly separate user's content and public content
+            # Ranking only needs ids, owners and embeddings; content is fetched for the winners
             cursor.execute('''
-            SELECT 
-                b.id, 
-                b.content, 
-                b.content_type, 
-                b.ai_summary, 
-                b.embedding, 
-                b.is_public, 
-                u.username,
-                b.user_id
-            FROM blobs b
-            LEFT JOIN users u ON b.user_id = u.user_id
+            SELECT id, user_id, embedding, embedding_scale, embedding_norm
+            FROM blobs
             WHERE (
-                b.user_id = ?  -- User's own content (both private and public)
+                user_id = ?  -- User's own content (both private and public)
                 OR 
-                (b.is_public = 1 AND b.user_id != ?)  -- Other users' public content
+                (is_public = 1 AND user_id != ?)  -- Other users' public content
             )
-            AND b.embedding IS NOT NULL
+            AND embedding IS NOT NULL
             ''', (user_id, user_id))
-            
-            results = []
-            for row in cursor.fetchall():
-                try:
-                    if row[4] is None:
-                        continue
-                        
-                    blob_embedding = np.frombuffer(row[4], dtype=np.float32)
-                    if blob_embedding.size == 0:
-                        continue
-                    
-                    similarity = np.dot(query_embedding, blob_embedding) / (
-                        norm(query_embedding) * norm(blob_embedding) + 1e-9
-                    )
-                    
-                    # Boost similarity for user's own content
-                    if row[7] == user_id:  # user_id is at index 7
-                        similarity *= 1.2  # 20% boost for own content
-                    
-                    results.append((similarity, row))
-                    logger.debug(f"Similarity score for blob {row[0]} (owned by {row[6]}): {similarity}")
-                except Exception as e:
-                    logger.error(f"Error processing embedding for blob {row[0]}: {e}")
-                    continue
-            
-            # Sort by similarity and return top results
-            results.sort(reverse=True, key=lambda x: x[0])
-            return [(r[1][0], r[1][1], r[1][2], r[1][3], r[0]) for r in results[:limit]]
+            rows = cursor.fetchall()
+
+            kept, codes, scales, norms = _stack_embeddings([row[2:] for row in rows], np.asarray(query_embedding).size)
+            if not len(kept):
+                return []
+            similarities = _int8_cosine(codes, scales, norms, query_embedding)
+            kept = [rows[i] for i in kept]
+
+            # Boost similarity for user's own content
+            own = np.fromiter((row[1] == user_id for row in kept), dtype=bool, count=len(kept))
+            similarities[own] *= 1.2  # 20% boost for own content
+
+            # Partial sort: only the top `limit` entries need ordering
+            if limit < len(similarities):
+                top = np.argpartition(-similarities, limit)[:limit]
+            else:
+                top = np.arange(len(similarities))
+            top = top[np.argsort(-similarities[top])]
+            best_ids = [kept[i][0] for i in top]
+
+            cursor.execute(f'''
+            SELECT id, content, content_type, ai_summary FROM blobs
+            WHERE id IN ({', '.join('?' * len(best_ids))})
+            ''', best_ids)
+            details = {row[0]: row for row in cursor.fetchall()}
+            return [details[blob_id] + (float(similarities[i]),) for blob_id, i in zip(best_ids, top)]
 
     def get_blobs_without_embeddings(self):
         with self.get_connection() as conn:
@@ -271,9 +466,26 @@ class BlobDatabase:
             cursor.execute('SELECT id, content, content_type FROM blobs WHERE embedding IS NULL')
             return cursor.fetchall()
 
+    def quantize_legacy_embeddings(self):
+        """Re-encode float32 embeddings stored before quantization as int8"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT id, embedding FROM blobs WHERE embedding IS NOT NULL AND embedding_scale IS NULL')
+            updates = [_quantize_embedding(np.frombuffer(data, dtype=np.float32)) + (blob_id,)
+                       for blob_id, data in cursor.fetchall()]
+            if updates:
+                cursor.executemany(
+                    'UPDATE blobs SET embedding = ?, embedding_scale = ?, embedding_norm = ? WHERE id = ?',
+                    updates
+                )
+                conn.commit()
+                logger.info(f"Quantized legacy embeddings for {len(updates)} blobs")
+            return len(updates)
+
     def reprocess_embeddings(self, get_embedding_func):
         """Reprocess all blobs without embeddings"""
         logger.info("Starting embedding reprocessing")
+        self.quantize_legacy_embeddings()
         blobs = self.get_blobs_without_embeddings()
         
         if not blobs:
@@ -302,8 +514,10 @@ class BlobDatabase:
 
     def _convert_to_dict(self, cursor, row):
         """Convert a database row tuple into a dictionary"""
+        if isinstance(row, sqlite3.Row):
+            return dict(row)
         field_names = [description[0] for description in cursor.description]
-        return {key: value for key, value in zip(field_names, row)}
+        return dict(zip(field_names, row))
         
     def row_to_dict(self, cursor, row):
         """Convert a single row to dictionary"""
@@ -313,4 +527,8 @@ class BlobDatabase:
         
     def rows_to_dicts(self, cursor, rows):
         """Convert multiple rows to dictionaries"""
-        return [self._convert_to_dict(cursor, row) for row in rows]
+        if rows and isinstance(rows[0], sqlite3.Row):
+            return [dict(row) for row in rows]
+        # Plain tuples (connections without a row factory): look the column names up once
+        field_names = [description[0] for description in cursor.description]
+        return [dict(zip(field_names, row)) for row in rows]
@@ -1,4 +1,3 @@
-import shutil
 import os
 import time
 import threading
@@ -10,13 +9,15 @@ from datetime import datetime
 logger = logging.getLogger(__name__)
 
 class DatabaseCopier:
-    def __init__(self, source_path, update_interval=30):  # Changed default to 30 seconds
+    def __init__(self, source_path, update_interval=30, on_copy=None):  # Changed default to 30 seconds
         self.source_path = source_path
         self.update_interval = update_interval
+        self.on_copy = on_copy  # Called after each successful copy, e.g. to drop caches built from it
         self.data_dir = os.path.join(str(Path.home()), '.personalblobai')
         self.copy_path = os.path.join(self.data_dir, 'blob_data_copy.db')
         self._stop_event = threading.Event()
         self._copy_thread = None
+        self._schema_verified = False  # Checked on the first copy and again after a failure
         self._init_copy_database()
         
     def start(self):
@@ -51,6 +52,8 @@ class DatabaseCopier:
             # Create a new connection to the copy database
             with sqlite3.connect(self.copy_path) as conn:
                 cursor = conn.cursor()
+                # Like the source: web app reads don't block while a backup writes the copy
+                cursor.execute('PRAGMA journal_mode = WAL')
                 
                 # Create the same schema as the main database
                 cursor.execute('''
@@ -73,6 +76,8 @@ class DatabaseCopier:
                     timestamp DATETIME,
                     ai_summary TEXT,
                     embedding BLOB,
+                    embedding_norm REAL,
+                    embedding_scale REAL,
                     FOREIGN KEY (user_id) REFERENCES users(user_id)
                 )''')
                 
@@ -98,20 +103,33 @@ class DatabaseCopier:
         """Create a copy of the database"""
         try:
             # First verify the copy database has correct schema
-            with sqlite3.connect(self.copy_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-                existing_tables = {row[0] for row in cursor.fetchall()}
-                
-                if not all(table in existing_tables for table in ['users', 'blobs', 'blob_likes']):
-                    self._init_copy_database()
+            if not self._schema_verified:
+                with sqlite3.connect(self.copy_path) as conn:
+                    cursor = conn.cursor()
+                    cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+                    existing_tables = {row[0] for row in cursor.fetchall()}
+                    
+                    if not all(table in existing_tables for table in ['users', 'blobs', 'blob_likes']):
+                        self._init_copy_database()
+                self._schema_verified = True
             
-            # Now perform the copy
-            shutil.copy2(self.source_path, self.copy_path)
+            # Online backup reads a consistent snapshot (WAL included) and writes the copy
+            # under SQLite's locks, so the web app can keep connections open on it. One step:
+            # a stepped backup restarts whenever the bot commits in between.
+            source = sqlite3.connect(self.source_path)
+            copy = sqlite3.connect(self.copy_path)
+            try:
+                source.backup(copy)
+            finally:
+                copy.close()
+                source.close()
             logger.info(f"Database copied successfully at {datetime.now()}")
+            if self.on_copy:
+                self.on_copy()
             
         except Exception as e:
             logger.error(f"Failed to copy database: {e}")
+            self._schema_verified = False
             # If copy fails, ensure we at least have a working schema
             self._init_copy_database()
             
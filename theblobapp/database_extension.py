@@ -1,26 +1,51 @@
-from database import BlobDatabase
+from database import BlobDatabase, _decode_embedding, _int8_cosine, _quantize_embedding, _stack_embeddings
+import sqlite3
+import threading
 import numpy as np
-from numpy.linalg import norm
 import logging
 
+try:
+    import hnswlib
+except ImportError:  # Optional: similar blobs are always scored against every public embedding
+    hnswlib = None
+
 logger = logging.getLogger(__name__)
 
-def get_public_blobs(self, page=1, per_page=10):
-    """Get paginated public blobs"""
-    offset = (page - 1) * per_page
+# From this many public embeddings on, similar blobs come from an HNSW graph, re-ranked exactly
+ANN_MIN_CANDIDATES = 20_000
+ANN_FANOUT = 10  # Graph neighbours fetched per requested result
+ANN_EF = 200  # Search breadth; bounds the neighbours one query can fetch
+
+# What feed, search and similar-blob cards render: a content preview, never the full
+# payload or the embedding (get_public_blob_by_id fetches those for the detail page)
+_BLOB_LIST_COLUMNS = '''
+    b.id, b.content_type, SUBSTR(b.content, 1, 240) AS preview, b.file_path,
+    b.timestamp, b.ai_summary, u.username, u.first_name
+'''
+
+def get_public_blobs(self, page=1, per_page=10, after_ts=None, after_id=None):
+    """Get paginated public blobs, newest first.
+
+    Pass the timestamp and id of the last blob already shown as after_ts/after_id to
+    continue right after it (keyset pagination: no skipped rows are read, however
+    deep the page); otherwise `page` selects a page by offset.
+    """
+    if after_ts is not None and after_id is not None:
+        keyset, params = 'AND (b.timestamp, b.id) < (?, ?)', (after_ts, after_id, per_page, 0)
+    else:
+        keyset, params = '', (per_page, (page - 1) * per_page)
     with self.get_read_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute('''
-        SELECT 
-            b.id, b.content_type, b.content, b.file_path, 
-            b.timestamp, b.ai_summary, u.username, u.first_name,
+        cursor.execute(f'''
+        SELECT {_BLOB_LIST_COLUMNS},
             (SELECT COUNT(*) FROM blob_likes WHERE blob_id = b.id) as likes_count
         FROM blobs b
         LEFT JOIN users u ON b.user_id = u.user_id
         WHERE b.is_public = 1
-        ORDER BY b.timestamp DESC
+        {keyset}
+        ORDER BY b.timestamp DESC, b.id DESC
         LIMIT ? OFFSET ?
-        ''', (per_page, offset))
+        ''', params)
         rows = cursor.fetchall()
         return self.rows_to_dicts(cursor, rows)
 
@@ -37,6 +62,7 @@ def get_public_blob_by_id(self, blob_id):
             b.timestamp,
             b.ai_summary,
             b.embedding,
+            b.embedding_scale,
             u.username,
             u.first_name,
             (SELECT COUNT(*) FROM blob_likes WHERE blob_id = b.id) as likes_count
@@ -47,13 +73,46 @@ def get_public_blob_by_id(self, blob_id):
         row = cursor.fetchone()
         return self.row_to_dict(cursor, row)
 
+def get_public_blobs_by_date(self, days=7, limit=500):
+    """Get the newest public blobs of the last `days` days, each tagged with its `day`"""
+    with self.get_read_connection() as conn:
+        cursor = conn.cursor()
+        # Timestamps are stored in local time; date() also copes with fractional seconds
+        cursor.execute(f'''
+        SELECT date(b.timestamp) AS day, {_BLOB_LIST_COLUMNS}
+        FROM blobs b
+        LEFT JOIN users u ON b.user_id = u.user_id
+        WHERE b.is_public = 1
+        AND b.timestamp > datetime('now', 'localtime', ?)
+        ORDER BY b.timestamp DESC
+        LIMIT ?
+        ''', (f'-{days} days', limit))
+        return self.rows_to_dicts(cursor, cursor.fetchall())
+
 def search_blobs(self, query):
     """Search blobs by content or summary"""
     with self.get_read_connection() as conn:
         cursor = conn.cursor()
+        # Every word must match as a prefix; quoting keeps FTS5 syntax out of user input
+        terms = ' '.join('"' + word.replace('"', '""') + '"*' for word in query.split())
+        if terms:
+            try:
+                cursor.execute(f'''
+                SELECT {_BLOB_LIST_COLUMNS}
+                FROM blobs_fts f
+                JOIN blobs b ON b.id = f.rowid
+                LEFT JOIN users u ON b.user_id = u.user_id
+                WHERE blobs_fts MATCH ?
+                AND b.is_public = 1
+                ORDER BY bm25(blobs_fts)
+                ''', (terms,))
+                return self.rows_to_dicts(cursor, cursor.fetchall())
+            except sqlite3.Error as e:
+                logger.debug(f"Full-text index unavailable, searching with LIKE: {e}")
+
         query = f"%{query}%"
-        cursor.execute('''
-        SELECT DISTINCT b.*, u.username, u.first_name
+        cursor.execute(f'''
+        SELECT {_BLOB_LIST_COLUMNS}
         FROM blobs b
         LEFT JOIN users u ON b.user_id = u.user_id
         WHERE b.is_public = 1 
@@ -62,57 +121,147 @@ def search_blobs(self, query):
         ''', (query, query))
         return self.rows_to_dicts(cursor, cursor.fetchall())
 
+def _similar_blobs_vec(self, cursor, blob_id, source_embedding, limit):
+    """KNN over the bot's vec_blobs index; raises sqlite3.Error when it isn't usable"""
+    # One extra neighbour since the source blob is its own nearest match
+    cursor.execute(f'''
+    WITH knn AS (
+        SELECT blob_id, distance
+        FROM vec_blobs
+        WHERE embedding MATCH vec_int8(?) AND k = ? AND is_public = 1
+    )
+    SELECT {_BLOB_LIST_COLUMNS}
+    FROM knn
+    JOIN blobs b ON b.id = knn.blob_id
+    LEFT JOIN users u ON b.user_id = u.user_id
+    WHERE b.id != ?
+    ORDER BY knn.distance
+    ''', (_quantize_embedding(source_embedding)[0], limit + 1, blob_id))
+    return self.rows_to_dicts(cursor, cursor.fetchall())[:limit]
+
+def _public_fingerprint(cursor):
+    """Cheap summary of the public embeddings; changes when the set or any embedding changes.
+
+    Re-embedding or quantizing a blob keeps its id but rewrites its scale and norm.
+    """
+    cursor.execute('''
+    SELECT COUNT(*), MAX(id), TOTAL(id), TOTAL(embedding_scale), TOTAL(embedding_norm)
+    FROM blobs
+    WHERE is_public = 1 
+    AND embedding IS NOT NULL
+    ''')
+    return tuple(cursor.fetchone())
+
+def _public_embeddings(self, cursor, dim):
+    """(ids, int8 codes, scales, norms) of all public embeddings of `dim` dims.
+
+    Built once from the database and reused while the public rows stay the same,
+    so a similar-blobs lookup is one kernel call instead of a scan over the BLOB column.
+    The int8 codes are kept as stored, at a quarter of the size of a float32 copy.
+    """
+    with self._public_embeddings_lock:
+        cached = self._public_embeddings
+        if cached is not None and cached[0] == dim and not self._public_embeddings_stale:
+            return cached[2]
+        # Cleared before reading so a change made meanwhile marks the result stale again
+        self._public_embeddings_stale = False
+        fingerprint = _public_fingerprint(cursor)
+        if cached is not None and cached[0] == dim and cached[1] == fingerprint:
+            return cached[2]
+
+        cursor.execute('''
+        SELECT id, embedding, embedding_scale, embedding_norm
+        FROM blobs
+        WHERE is_public = 1 
+        AND embedding IS NOT NULL
+        ''')
+        rows = cursor.fetchall()
+        kept, codes, scales, norms = _stack_embeddings([row[1:] for row in rows], dim)
+        embeddings = (np.array([rows[i][0] for i in kept], dtype=np.int64), codes, scales, norms)
+
+        self._public_embeddings = (dim, fingerprint, embeddings)
+        self._public_ann = None
+        logger.info(f"Cached {len(kept)} public embeddings of {dim} dims")
+        if hnswlib is not None and len(kept) >= ANN_MIN_CANDIDATES:
+            threading.Thread(target=_build_public_ann, args=(self, embeddings), daemon=True).start()
+        return embeddings
+
+def _build_public_ann(self, embeddings):
+    """Build an HNSW graph over cached public embeddings; labels are row indices into them"""
+    try:
+        _, codes, scales, norms = embeddings
+        logger.info(f"Building HNSW index over {len(codes)} public embeddings")
+        # Unit-length float32 rows exist only while the graph is built
+        vectors = codes.astype(np.float32) * (scales / (norms + 1e-9))[:, None]
+        ann = hnswlib.Index(space='ip', dim=codes.shape[1])
+        ann.init_index(max_elements=len(codes), ef_construction=64, M=16)
+        ann.add_items(vectors, np.arange(len(codes)))
+        ann.set_ef(ANN_EF)
+        with self._public_embeddings_lock:
+            # Only attach it if the embeddings weren't replaced while building
+            cached = self._public_embeddings
+            if cached is not None and cached[2] is embeddings:
+                self._public_ann = (embeddings, ann)
+        logger.info("HNSW index ready")
+    except Exception as e:
+        logger.error(f"Failed to build HNSW index: {e}")
+
 def get_similar_blobs(self, blob_id, limit=3):
     """Get similar blobs based on embedding similarity"""
-    # First get the source blob's embedding
-    source_blob = self.get_public_blob_by_id(blob_id)
-    if not source_blob or not source_blob.get('embedding'):
-        return []
-
     with self.get_read_connection() as conn:
         cursor = conn.cursor()
+        # First get the source blob's embedding, on the same connection as the ranking
         cursor.execute('''
-        SELECT 
-            b.id,
-            b.content_type,
-            b.content,
-            b.file_path,
-            b.timestamp,
-            b.ai_summary,
-            b.embedding,
-            u.username,
-            u.first_name
+        SELECT embedding, embedding_scale FROM blobs
+        WHERE id = ? AND is_public = 1
+        ''', (blob_id,))
+        source_blob = cursor.fetchone()
+        if not source_blob or not source_blob[0]:
+            return []
+        source_embedding = _decode_embedding(source_blob[0], source_blob[1])
+
+        try:
+            return _similar_blobs_vec(self, cursor, blob_id, source_embedding, limit)
+        except sqlite3.Error as e:
+            logger.debug(f"vec_blobs unavailable, ranking similar blobs in NumPy: {e}")
+
+        embeddings = _public_embeddings(self, cursor, source_embedding.size)
+        ids, codes, scales, norms = embeddings
+        ann = self._public_ann
+        if ann is not None and ann[0] is embeddings:
+            # Candidate rows from the graph, re-ranked exactly against the cached codes
+            k = min((limit + 1) * ANN_FANOUT, ANN_EF, len(ids))
+            query = source_embedding / (np.sqrt(source_embedding @ source_embedding) + 1e-9)
+            labels, _ = ann[1].knn_query(query, k=k)
+            rows = labels[0].astype(np.int64)
+            similarities = _int8_cosine(codes[rows], scales[rows], norms[rows], source_embedding)
+        else:
+            rows = np.arange(len(ids))
+            similarities = _int8_cosine(codes, scales, norms, source_embedding)
+        similarities[ids[rows] == blob_id] = -np.inf
+        candidates = min(limit, len(rows) - 1)
+        if candidates <= 0:
+            return []
+
+        # Partial sort: only the top `limit` entries need ordering
+        if candidates < len(similarities):
+            top = np.argpartition(-similarities, candidates)[:candidates]
+        else:
+            top = np.arange(len(similarities))
+        best_ids = ids[rows[top[np.argsort(-similarities[top])]]].tolist()
+
+        cursor.execute(f'''
+        SELECT {_BLOB_LIST_COLUMNS}
         FROM blobs b
         LEFT JOIN users u ON b.user_id = u.user_id
-        WHERE b.is_public = 1 
-        AND b.id != ? 
-        AND b.embedding IS NOT NULL
-        ''', (blob_id,))
-        
-        results = []
-        source_embedding = np.frombuffer(source_blob['embedding'], dtype=np.float32)
-        
-        for row in cursor:
-            blob_dict = self.row_to_dict(cursor, row)
-            if not blob_dict['embedding']:
-                continue
-                
-            try:
-                target_embedding = np.frombuffer(blob_dict['embedding'], dtype=np.float32)
-                similarity = np.dot(source_embedding, target_embedding) / (
-                    norm(source_embedding) * norm(target_embedding) + 1e-9
-                )
-                results.append((similarity, blob_dict))
-            except Exception as e:
-                logger.error(f"Error calculating similarity for blob {blob_dict['id']}: {e}")
-                continue
-        
-        # Sort by similarity and return top results
-        results.sort(reverse=True, key=lambda x: x[0])
-        return [r[1] for r in results[:limit]]
+        WHERE b.id IN ({', '.join('?' * len(best_ids))})
+        ''', best_ids)
+        details = {row['id']: row for row in self.rows_to_dicts(cursor, cursor.fetchall())}
+        return [details[i] for i in best_ids if i in details]
 
 # Add these methods to BlobDatabase
 BlobDatabase.get_public_blobs = get_public_blobs
 BlobDatabase.get_public_blob_by_id = get_public_blob_by_id
+BlobDatabase.get_public_blobs_by_date = get_public_blobs_by_date
 BlobDatabase.get_similar_blobs = get_similar_blobs
 BlobDatabase.search_blobs = search_blobs
@@ -1,55 +1,88 @@
+import asyncio
 import base64
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 import logging
 
 logger = logging.getLogger(__name__)
 
-def encode_image_to_base64(image_path):
+# Shared Ollama client: its connection pool keeps connections alive between calls
+_CLIENT = OpenAI(api_key="local", base_url="http://localhost:11434/v1")
+_ASYNC_CLIENT = AsyncOpenAI(api_key="local", base_url="http://localhost:11434/v1")
+
+# Read size for base64 encoding; a multiple of 3 so no chunk but the last gets padding
+ENCODE_CHUNK_SIZE = 3 * 1024 * 64
+
+def encode_image_to_base64(image_path, prefix=''):
+    """Base64-encode an image file, optionally behind a prefix such as a data URL header"""
     try:
+        # Encode chunk by chunk so the raw image is never read whole; the peak is the encoded
+        # bytes plus the one str copy the request needs, made by the decode below
+        encoded = bytearray(prefix.encode('ascii'))
         with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode('utf-8')
+            for chunk in iter(lambda: image_file.read(ENCODE_CHUNK_SIZE), b''):
+                encoded += base64.b64encode(chunk)
+        return encoded.decode('ascii')
     except Exception as e:
         logger.error(f"Error encoding image: {e}")
         return None
 
+ANALYZE_IMAGE_PROMPT = (
+    "Please analyze this image in detail. Provide:\n"
+    "1. A detailed description of what you see\n"
+    "2. Any text that appears in the image\n"
+    "3. Notable objects, colors, and patterns\n"
+    "4. The overall context or setting"
+)
+
+def _image_messages(image_url):
+    return [
+        {
+            "role": "user",
+            "content": [
+                {
+                    "type": "text",
+                    "text": ANALYZE_IMAGE_PROMPT
+                },
+                {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": image_url
+                    }
+                }
+            ]
+        }
+    ]
+
 def analyze_image(image_path):
     """Analyze image using LLaVA model for detailed description and text extraction"""
     try:
-        base64_image = encode_image_to_base64(image_path)
-        if not base64_image:
+        # Built as the data URL directly so the encoded image isn't copied into an f-string
+        image_url = encode_image_to_base64(image_path, prefix="data:image/jpeg;base64,")
+        if not image_url:
             return "Failed to process image"
 
-        client = OpenAI(api_key="local", base_url="http://localhost:11434/v1")
-        
-        prompt = (
-            "Please analyze this image in detail. Provide:\n"
-            "1. A detailed description of what you see\n"
-            "2. Any text that appears in the image\n"
-            "3. Notable objects, colors, and patterns\n"
-            "4. The overall context or setting"
+        response = _CLIENT.chat.completions.create(
+            model="llava",
+            messages=_image_messages(image_url)
         )
+        
+        return response.choices[0].message.content
+    except Exception as e:
+        logger.error(f"Vision analysis error: {e}")
+        return f"Failed to analyze image: {str(e)}"
+
+async def analyze_image_async(image_path):
+    """analyze_image for the bot's event loop: other updates keep running during inference"""
+    try:
+        image_url = await asyncio.to_thread(encode_image_to_base64, image_path, "data:image/jpeg;base64,")
+        if not image_url:
+            return "Failed to process image"
 
-        response = client.chat.completions.create(
+        response = await _ASYNC_CLIENT.chat.completions.create(
             model="llava",
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": prompt
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{base64_image}"
-                            }
-                        }
-                    ]
-                }
-            ]
+            messages=_image_messages(image_url)
         )
-        
+
         return response.choices[0].message.content
     except Exception as e:
         logger.error(f"Vision analysis error: {e}")